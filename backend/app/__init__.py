@@ -1,9 +1,11 @@
 from flask import Flask
-from app.extensions import db
-from app.routes import auth, patient_routes, model
+from app.extensions import db, migrate
+from app.routes import auth, patient_routes, model, health
+from app.ml import registry
+from app import cli
+from app.utils.db_pool import engine_options
+from app.utils import instrumentation
 import os
-import time
-from sqlalchemy.exc import OperationalError
 from flasgger import Swagger
 from flask_cors import CORS
 import sys
@@ -14,9 +16,12 @@ def create_app():
 
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL")
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(os.getenv("DATABASE_URL"))
     app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
 
     db.init_app(app)
+    # The schema is versioned in migrations/; run `flask db upgrade` before starting workers
+    migrate.init_app(app, db, render_as_batch=True)
 
     CORS(app, origins=["http://20.82.105.66:5173"])
 
@@ -24,20 +29,17 @@ def create_app():
     app.register_blueprint(patient_routes.bp)
     app.register_blueprint(model.bp)
     app.register_blueprint(model.bpM)
+    app.register_blueprint(health.bp)
 
+    cli.init_app(app)
+    instrumentation.init_app(app)
 
     Swagger(app)
 
-    with app.app_context():
-        for i in range(10):
-            try:
-                db.create_all()
-                print("Database connected.")
-                break
-            except OperationalError:
-                print(f"Waiting for DB... ({i + 1}/10)")
-                time.sleep(3)
-        else:
-            print("Database connection failed after 10 attempts.")
+    registry.configure_threads()
+    # Off by default so scripts and the master process never import TensorFlow;
+    # gunicorn workers and the inference server warm up on their own
+    if os.getenv("MODEL_WARMUP", "0") == "1":
+        registry.warm_up()
 
     return app
@@ -0,0 +1,32 @@
+import time
+
+import click
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db
+
+
+@click.command('wait-for-db')
+@click.option('--timeout', default=30.0, show_default=True, help="Seconds to keep retrying.")
+@click.option('--interval', default=1.0, show_default=True, help="Seconds between attempts.")
+def wait_for_db(timeout, interval):
+    """Block until the database accepts connections (run before `flask db upgrade`)."""
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            click.echo("Database connected.")
+            return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise click.ClickException(f"Database not reachable after {attempt} attempts.")
+            click.echo(f"Waiting for DB... ({attempt})")
+            time.sleep(interval)
+
+
+def init_app(app):
+    app.cli.add_command(wait_for_db)
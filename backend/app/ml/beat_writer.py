@@ -0,0 +1,180 @@
+"""Background persistence for beats classified by /model/classify.
+
+A batch that still fails after BEAT_WRITER_RETRIES attempts with exponential
+backoff is written as JSON lines to BEAT_WRITER_DEAD_LETTER_DIR. Once the
+database is healthy again, load those files back with:
+
+    python -m app.utils.replay_heartbeats
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import numpy as np
+from prometheus_client import Counter
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models.heartbeat import Heartbeat
+from app.ml.prediction import ensure_patients_exist
+from app.utils.summaries import update_patient_summaries
+
+WRITER_BATCH_SIZE = int(os.getenv("BEAT_WRITER_BATCH_SIZE", 500))
+WRITER_FLUSH_INTERVAL = float(os.getenv("BEAT_WRITER_FLUSH_MS", 200)) / 1000
+WRITER_QUEUE_SIZE = int(os.getenv("BEAT_WRITER_QUEUE_SIZE", 5000))  # Pending requests, not beats
+WRITER_RETRIES = int(os.getenv("BEAT_WRITER_RETRIES", 3))
+WRITER_RETRY_BACKOFF = float(os.getenv("BEAT_WRITER_RETRY_BACKOFF_MS", 200)) / 1000  # Doubles per retry
+DEAD_LETTER_DIR = os.getenv("BEAT_WRITER_DEAD_LETTER_DIR", "/tmp/arrhythmia_dead_letters")
+
+HEARTBEATS_WRITTEN = Counter("arrhythmia_beat_writer_written", "Heartbeats persisted by the background writer")
+HEARTBEATS_FAILED = Counter("arrhythmia_beat_writer_failed", "Heartbeats the writer could not persist after retries")
+HEARTBEATS_DEAD_LETTERED = Counter(
+    "arrhythmia_beat_writer_dead_lettered", "Failed heartbeats saved to the dead-letter directory"
+)
+WRITE_RETRIES = Counter("arrhythmia_beat_writer_retries", "Heartbeat batch writes that were retried")
+
+_STOP = object()
+
+
+class HeartbeatWriter:
+    """Persists classified beats from a background thread, in batches.
+
+    Requests only enqueue rows, so the database round trip is off their
+    response path. Rows are flushed every WRITER_BATCH_SIZE beats or
+    WRITER_FLUSH_INTERVAL seconds, whichever comes first.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="heartbeat-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue heartbeat rows; raises queue.Full when the writer is too far behind."""
+        self._queue.put_nowait(list(rows))
+
+    def close(self, timeout=10):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                if not batch:
+                    deadline = time.monotonic() + WRITER_FLUSH_INTERVAL
+                batch.extend(item)
+
+            if batch and (item is None or item is _STOP or len(batch) >= WRITER_BATCH_SIZE):
+                self._flush(batch)
+                batch, deadline = [], None
+            if item is _STOP:
+                return
+
+    def _flush(self, rows):
+        delay = WRITER_RETRY_BACKOFF
+        for attempt in range(WRITER_RETRIES + 1):
+            try:
+                with self.app.app_context():
+                    write_heartbeats(rows)
+            except Exception as e:
+                if attempt == WRITER_RETRIES:
+                    traceback.print_exc()
+                    break
+                print(f"Writing {len(rows)} heartbeats failed ({e}); retrying in {delay * 1000:.0f} ms")
+                WRITE_RETRIES.inc()
+                time.sleep(delay)
+                delay *= 2
+            else:
+                self.written += len(rows)
+                HEARTBEATS_WRITTEN.inc(len(rows))
+                return
+
+        self.failed += len(rows)
+        HEARTBEATS_FAILED.inc(len(rows))
+        dead_letter(rows)
+
+
+def write_heartbeats(rows):
+    """Insert ``rows`` and fold them into the patient summaries in one transaction."""
+    try:
+        ensure_patients_exist({row["patient_id"] for row in rows})
+        db.session.execute(insert(Heartbeat), rows)
+        update_patient_summaries(
+            [row["patient_id"] for row in rows],
+            [row["predicted_type"] for row in rows],
+            [row["prediction_confidence"] for row in rows],
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def dead_letter(rows):
+    """Save rows that could not be written as JSON lines; returns the file path, or None if that failed too."""
+    failed_at = datetime.utcnow()
+    path = os.path.join(DEAD_LETTER_DIR, f"heartbeats_{failed_at:%Y%m%dT%H%M%S%f}_{os.getpid()}.jsonl")
+    try:
+        os.makedirs(DEAD_LETTER_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            for row in rows:
+                record = dict(row, ecg_features=np.asarray(row["ecg_features"], dtype=np.float32).tolist())
+                # Keep the time the beat was classified rather than the time it is replayed
+                record["timestamp"] = (row.get("timestamp") or failed_at).isoformat()
+                f.write(json.dumps(record) + "\n")
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        traceback.print_exc()
+        print(f"Lost {len(rows)} heartbeats: could not write them to {DEAD_LETTER_DIR}")
+        return None
+
+    HEARTBEATS_DEAD_LETTERED.inc(len(rows))
+    print(f"Saved {len(rows)} unwritten heartbeats to {path}")
+    return path
+
+
+def replay_dead_letters(directory=DEAD_LETTER_DIR):
+    """Write every dead-lettered batch in ``directory``, deleting each file once it is stored."""
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(directory, "heartbeats_*.jsonl"))):
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row["ecg_features"] = np.asarray(row["ecg_features"], dtype=np.float32)
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        write_heartbeats(rows)
+        os.remove(path)
+        replayed += len(rows)
+        print(f"Replayed {len(rows)} heartbeats from {path}")
+    return replayed
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def enqueue_heartbeats(app, rows):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = HeartbeatWriter(app)
+            # Flush whatever is still queued when the worker shuts down
+            atexit.register(_writer.close)
+    _writer.submit(rows)
@@ -0,0 +1,119 @@
+import numpy as np
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.heartbeat import Heartbeat
+from app.ml.model import CLASS_MAP
+
+EXPECTED_FEATURE_LENGTH = 187
+MAX_FEATURE_LENGTH = EXPECTED_FEATURE_LENGTH + 2  # Older uploads stored label/record after the signal
+FETCH_BATCH_SIZE = 10000
+SAMPLE_ISSUES = 5
+REPLAY_HASH_MULTIPLIER = 7919
+
+SKIP_REASONS = ("features_missing", "too_short", "too_long", "invalid_label")
+
+
+def labeled_heartbeats_filter(max_id=None):
+    criteria = [Heartbeat.heartbeat_type.isnot(None)]
+    if max_id is not None:
+        criteria.append(Heartbeat.id <= max_id)
+    return criteria
+
+
+def current_max_id():
+    return db.session.query(func.max(Heartbeat.id)).scalar() or 0
+
+
+def replay_sample(fraction):
+    # Deterministic pseudo-random sample by id, so every epoch replays the same rows
+    return (Heartbeat.id * REPLAY_HASH_MULTIPLIER) % 1000 < int(fraction * 1000)
+
+
+def build_training_set(batch_size=FETCH_BATCH_SIZE, criteria=(), max_id=None):
+    """Load every labeled heartbeat into a float32 ``(N, 187, 1)`` array.
+
+    ``criteria`` narrows the rows further (e.g. to an incremental window).
+    Returns ``(X, y, stats)`` where ``stats`` counts the rows that were
+    skipped per reason and keeps a few example ids for each.
+    """
+    # Pin the id range so rows inserted while we stream cannot overflow the buffer
+    if max_id is None:
+        max_id = current_max_id()
+    filters = labeled_heartbeats_filter(max_id) + list(criteria)
+    capacity = db.session.query(func.count(Heartbeat.id)).filter(*filters).scalar()
+
+    X = np.empty((capacity, EXPECTED_FEATURE_LENGTH, 1), dtype=np.float32)
+    y = np.empty(capacity, dtype=np.int64)
+    stats = new_stats()
+
+    stmt = (
+        select(Heartbeat.id, Heartbeat.ecg_features, Heartbeat.heartbeat_type)
+        .where(*filters)
+        .order_by(Heartbeat.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    filled = 0
+    for rows in db.session.execute(stmt).partitions():
+        ids, features, labels = split_columns(rows)
+        indices, targets = validate_batch(ids, features, labels, stats)
+
+        count = min(len(indices), capacity - filled)
+        if count <= 0:
+            continue
+        # Each feature is a frombuffer view over its row's bytes; copy it straight into place
+        for row, i in enumerate(indices[:count], start=filled):
+            X[row, :, 0] = features[i][:EXPECTED_FEATURE_LENGTH]
+        y[filled:filled + count] = targets[:count]
+        filled += count
+
+    stats["valid"] = filled
+    return X[:filled], y[:filled], stats
+
+
+def new_stats():
+    return {
+        "total": 0,
+        "valid": 0,
+        "skipped": {reason: 0 for reason in SKIP_REASONS},
+        "samples": {reason: [] for reason in SKIP_REASONS}
+    }
+
+
+def split_columns(rows):
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    features = [row[1] for row in rows]
+    labels = [row[2] for row in rows]
+    return ids, features, labels
+
+
+def validate_batch(ids, features, labels, stats):
+    lengths = np.fromiter(
+        (len(f) if f is not None else -1 for f in features), dtype=np.int64, count=len(features)
+    )
+    missing = lengths < 0
+    too_short = ~missing & (lengths < EXPECTED_FEATURE_LENGTH)
+    too_long = lengths > MAX_FEATURE_LENGTH
+    length_ok = ~(missing | too_short | too_long)
+
+    # Long vectors carry the ground truth right after the signal, short ones in heartbeat_type
+    has_inline_label = length_ok & (lengths > EXPECTED_FEATURE_LENGTH)
+    targets = np.fromiter(
+        (CLASS_MAP.get(str(label), -1) for label in labels), dtype=np.int64, count=len(labels)
+    )
+    for i in np.flatnonzero(has_inline_label):
+        targets[i] = CLASS_MAP.get(str(int(features[i][EXPECTED_FEATURE_LENGTH])), -1)
+    invalid_label = length_ok & (targets < 0)
+
+    stats["total"] += len(ids)
+    for reason, mask in (("features_missing", missing), ("too_short", too_short),
+                         ("too_long", too_long), ("invalid_label", invalid_label)):
+        stats["skipped"][reason] += int(mask.sum())
+        room = SAMPLE_ISSUES - len(stats["samples"][reason])
+        if room > 0:
+            stats["samples"][reason].extend(ids[mask][:room].tolist())
+
+    valid = np.flatnonzero(length_ok & ~invalid_label)
+    stats["valid"] += len(valid)
+    return valid, targets[valid]
@@ -0,0 +1,174 @@
+"""Runtimes for models exported to TFLite or ONNX, as an alternative to full Keras.
+
+INFERENCE_ENGINE selects what get_predictor(), the classify endpoint and the
+inference server run:
+
+    keras            the .h5 model in TensorFlow (default)
+    tflite           float32 TFLite
+    tflite-float16   TFLite with float16 weights
+    tflite-int8      TFLite with dynamic-range int8 quantization
+    onnx             ONNX Runtime
+    onnx-int8        ONNX Runtime with dynamic int8 quantization
+
+Exported files sit next to the .h5 model and are rebuilt when it is newer
+by app.ml.export_models or the worker warm-up, never by a request: until a
+model is exported, requests run it in Keras (see registry.engine_for). TFLite runs through the ``ai-edge-litert``
+interpreter when it is installed, so those workers never load TensorFlow;
+ONNX needs ``onnxruntime``, plus ``tf2onnx`` to export.
+"""
+import os
+import threading
+
+import numpy as np
+
+ENGINES = ("keras", "tflite", "tflite-float16", "tflite-int8", "onnx", "onnx-int8")
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "keras")
+# The LSTM layers only convert with a static batch dimension, so TFLite models
+# are exported once per batch size and inputs are split across them
+TFLITE_BATCH_SIZES = tuple(sorted({int(s) for s in os.getenv("TFLITE_BATCH_SIZES", "1,8,64").split(",")}))
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", 1024))
+NUM_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", 0)) or None
+
+_export_lock = threading.Lock()
+
+
+class NotExportedError(RuntimeError):
+    """The model has no up-to-date export for the requested engine."""
+
+
+def parse_engine(engine):
+    """Split ``engine`` into ``(runtime, quantization)``, e.g. ``("tflite", "int8")``."""
+    if engine not in ENGINES:
+        raise ValueError(f"Inference engine must be one of {', '.join(ENGINES)}")
+    runtime, _, quantization = engine.partition("-")
+    return runtime, quantization or None
+
+
+def artifact_paths(source_path, engine):
+    """Files exported from ``source_path`` (the .h5 model) for ``engine``; TFLite maps batch size -> path."""
+    runtime, quantization = parse_engine(engine)
+    base = os.path.splitext(source_path)[0]
+    if runtime == "tflite":
+        return {batch: f"{base}.{quantization or 'float32'}.b{batch}.tflite" for batch in TFLITE_BATCH_SIZES}
+    if runtime == "onnx":
+        return {None: f"{base}.int8.onnx" if quantization else f"{base}.onnx"}
+    return {}
+
+
+def is_exported(source_path, engine):
+    source_mtime = os.path.getmtime(source_path)
+    return all(
+        os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+        for path in artifact_paths(source_path, engine).values()
+    )
+
+
+def load_runtime(source_path, engine, export=False):
+    """Return a runtime with ``predict(X)`` for ``engine``.
+
+    A missing or stale export raises NotExportedError unless ``export`` is set;
+    converting takes minutes and must not run while a request waits.
+    """
+    runtime, _ = parse_engine(engine)
+    if runtime == "keras":
+        raise ValueError("Keras models are loaded by the registry")
+
+    with _export_lock:
+        if not is_exported(source_path, engine):
+            if not export:
+                raise NotExportedError(
+                    f"{os.path.basename(source_path)} is not exported for the {engine} engine; "
+                    f"run python -m app.ml.export_models --engine {engine}"
+                )
+            from app.ml.export_models import export_model
+            print(f"Exporting {os.path.basename(source_path)} for the {engine} engine")
+            export_model(source_path, engine)
+
+    paths = artifact_paths(source_path, engine)
+    if runtime == "tflite":
+        return TFLiteRuntime(paths)
+    return ONNXRuntime(paths[None])
+
+
+def _interpreter_class():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        # Same interpreter, bundled with TensorFlow
+        from app.ml.registry import load_tensorflow
+        Interpreter = load_tensorflow().lite.Interpreter
+    return Interpreter
+
+
+class TFLiteRuntime:
+    """Runs fixed-batch TFLite models; interpreters are not thread-safe, so each thread gets its own."""
+
+    def __init__(self, paths):
+        self._models = {}
+        for batch, path in paths.items():
+            with open(path, "rb") as f:
+                self._models[batch] = f.read()
+        self._batch_sizes = sorted(self._models, reverse=True)
+        self._interpreter_class = _interpreter_class()
+        self._local = threading.local()
+
+    def _interpreter(self, batch):
+        interpreters = getattr(self._local, "interpreters", None)
+        if interpreters is None:
+            interpreters = self._local.interpreters = {}
+        if batch not in interpreters:
+            interpreter = self._interpreter_class(model_content=self._models[batch], num_threads=NUM_THREADS)
+            interpreter.allocate_tensors()
+            interpreters[batch] = (
+                interpreter,
+                interpreter.get_input_details()[0],
+                interpreter.get_output_details()[0]["index"]
+            )
+        return interpreters[batch]
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        outputs = []
+        start = 0
+        while start < len(X):
+            remaining = len(X) - start
+            # Largest batch that fits; pad only when fewer rows are left than the smallest batch
+            batch = next((b for b in self._batch_sizes if b <= remaining), self._batch_sizes[-1])
+            rows = min(batch, remaining)
+            interpreter, input_details, output_index = self._interpreter(batch)
+
+            chunk = X[start:start + rows]
+            if rows < batch:
+                chunk = np.concatenate([chunk, np.zeros((batch - rows, X.shape[1]), dtype=np.float32)])
+            interpreter.set_tensor(input_details["index"], chunk.reshape(input_details["shape"]))
+            interpreter.invoke()
+            outputs.append(interpreter.get_tensor(output_index)[:rows])
+            start += rows
+        return np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
+
+
+class ONNXRuntime:
+    """Runs an ONNX model with a dynamic batch dimension; sessions are safe to share between threads."""
+
+    def __init__(self, path):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ValueError("The onnx engines require the 'onnxruntime' package")
+
+        options = ort.SessionOptions()
+        if NUM_THREADS:
+            options.intra_op_num_threads = NUM_THREADS
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        self._feature_shape = tuple(model_input.shape[1:])
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape((len(X),) + self._feature_shape)
+        # Bounded chunks keep ONNX Runtime's memory arena from growing with the upload size
+        outputs = [
+            self._session.run(None, {self._input_name: X[start:start + ONNX_BATCH_SIZE]})[0]
+            for start in range(0, len(X), ONNX_BATCH_SIZE)
+        ]
+        return np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
@@ -0,0 +1,193 @@
+"""Export Keras models to TFLite or ONNX and check them against the Keras output.
+
+Every .h5 model in MODEL_FOLDER is exported, which includes each retrained
+TrainedModel version. The parity check runs the original and the exported
+model over a held-out set (a CSV in the /model/predict upload format, e.g.
+mitbih_test.csv, or synthetic beats) and fails if the predicted classes
+disagree or the accuracy drops by more than the given margins:
+
+    python -m app.ml.export_models --engine tflite-float16 --engine tflite-int8 --holdout mitbih_test.csv
+    python -m app.ml.export_models --engine onnx --model best_model_cnn_lstm
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml import registry
+from app.ml.engines import ENGINES, artifact_paths, parse_engine
+
+# Only imported when exporting, which needs TensorFlow anyway
+tf = registry.load_tensorflow()
+
+ONNX_OPSET = 17
+SYNTHETIC_HOLDOUT_ROWS = 2000
+MAX_ACCURACY_DROP = 0.005
+MIN_AGREEMENT = 0.99
+
+
+def export_model(source_path, engine, model=None):
+    """Write the ``engine`` files for the Keras model saved at ``source_path`` and return their paths."""
+    runtime, quantization = parse_engine(engine)
+    if model is None:
+        model = tf.keras.models.load_model(source_path, compile=False)
+
+    paths = artifact_paths(source_path, engine)
+    for batch, path in paths.items():
+        if runtime == "tflite":
+            data = _tflite_bytes(model, batch, quantization)
+        else:
+            data = _onnx_bytes(model, quantization)
+        # Workers may be loading the previous export; swap the file in whole
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return list(paths.values())
+
+
+def _tflite_bytes(model, batch, quantization):
+    inputs = tf.keras.Input(batch_shape=(batch,) + tuple(model.input_shape[1:]))
+    fixed = tf.keras.Model(inputs, model(inputs))
+    converter = tf.lite.TFLiteConverter.from_keras_model(fixed)
+    if quantization:
+        # Dynamic range: weights are stored quantized, activations stay float
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def _onnx_bytes(model, quantization):
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ValueError("Exporting to ONNX requires the 'tf2onnx' package")
+
+    # tf2onnx.convert.from_keras does not understand Keras 3 models; the traced forward pass converts fine
+    forward = tf.function(lambda x: model(x, training=False))
+    signature = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="beats"),)
+    proto, _ = tf2onnx.convert.from_function(forward, input_signature=signature, opset=ONNX_OPSET)
+    if not quantization:
+        return proto.SerializeToString()
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        float_path = os.path.join(tmpdir, "float.onnx")
+        int8_path = os.path.join(tmpdir, "int8.onnx")
+        with open(float_path, "wb") as f:
+            f.write(proto.SerializeToString())
+        quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+        with open(int8_path, "rb") as f:
+            return f.read()
+
+
+def load_holdout(path=None, rows=SYNTHETIC_HOLDOUT_ROWS):
+    """Return ``(X, y)`` from a labeled CSV, or synthetic beats (y is None) without one."""
+    if path is None:
+        from app.utils.seed import generate_beats
+        X, _ = generate_beats(rows, np.random.default_rng(0))
+        return X, None
+
+    from app.ml.ingest import read_csv_chunks
+    from app.ml.prediction import prepare_features
+
+    features, labels = [], []
+    with open(path, "rb") as stream:
+        for data in read_csv_chunks(stream):
+            X, y = prepare_features(data)
+            features.append(X)
+            labels.append(y)
+    y = np.concatenate(labels) if labels[0] is not None else None
+    return np.concatenate(features), y
+
+
+def check_parity(model_name, engine, X, y=None):
+    """Compare ``engine`` with the Keras model on ``X``; accuracies are only reported when ``y`` is given."""
+    model = registry.get_model(model_name)
+    runtime = registry.get_runtime(model_name, engine)
+    X_keras = X.reshape((len(X),) + tuple(model.input_shape[1:]))
+    # First calls build graphs and interpreters; keep them out of the timings
+    model.predict(X_keras[:1], verbose=0)
+    runtime.predict(X[:1])
+
+    started = time.perf_counter()
+    expected = model.predict(X_keras, batch_size=1024, verbose=0)
+    keras_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = runtime.predict(X)
+    engine_seconds = time.perf_counter() - started
+
+    difference = np.abs(actual - expected)
+    expected_classes = np.argmax(expected, axis=1)
+    actual_classes = np.argmax(actual, axis=1)
+    source_path = registry.model_path(model_name)
+    report = {
+        "model": model_name,
+        "engine": engine,
+        "rows": len(X),
+        "agreement": float(np.mean(expected_classes == actual_classes)),
+        "max_abs_diff": float(difference.max()),
+        "mean_abs_diff": float(difference.mean()),
+        "keras_rows_per_second": round(len(X) / keras_seconds, 1),
+        "engine_rows_per_second": round(len(X) / engine_seconds, 1),
+        "keras_kb": round(os.path.getsize(source_path) / 1024, 1),
+        "engine_kb": round(sum(os.path.getsize(p) for p in artifact_paths(source_path, engine).values()) / 1024, 1),
+    }
+    if y is not None:
+        report["keras_accuracy"] = float(np.mean(expected_classes == y))
+        report["engine_accuracy"] = float(np.mean(actual_classes == y))
+    return report
+
+
+def parity_failures(report, max_accuracy_drop=MAX_ACCURACY_DROP, min_agreement=MIN_AGREEMENT):
+    failures = []
+    if report["agreement"] < min_agreement:
+        failures.append(f"agreement {report['agreement']:.4f} < {min_agreement}")
+    if "keras_accuracy" in report and report["keras_accuracy"] - report["engine_accuracy"] > max_accuracy_drop:
+        failures.append(f"accuracy {report['keras_accuracy']:.4f} -> {report['engine_accuracy']:.4f}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", action="append", choices=[e for e in ENGINES if e != "keras"],
+                        help="repeat for several engines (default tflite-float16)")
+    parser.add_argument("--model", action="append", help="repeat for several models (default: all)")
+    parser.add_argument("--holdout", help="labeled CSV: 187 feature columns then the class")
+    parser.add_argument("--max-accuracy-drop", type=float, default=MAX_ACCURACY_DROP)
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT)
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args()
+
+    registry.configure_threads()
+    engine_names = args.engine or ["tflite-float16"]
+    model_names = args.model or registry.list_model_names()
+    X, y = (None, None) if args.skip_parity else load_holdout(args.holdout)
+    failed = False
+
+    for name in model_names:
+        for engine in engine_names:
+            try:
+                started = time.perf_counter()
+                paths = export_model(registry.model_path(name), engine)
+                print(f"{name} -> {engine}: {len(paths)} file(s) in {time.perf_counter() - started:.1f}s")
+                if args.skip_parity:
+                    continue
+
+                report = check_parity(name, engine, X, y)
+            except Exception as e:
+                failed = True
+                print(f"{name} -> {engine}: FAILED: {e}")
+                continue
+
+            failures = parity_failures(report, args.max_accuracy_drop, args.min_agreement)
+            failed = failed or bool(failures)
+            print("  " + ", ".join(f"{key}={value}" for key, value in report.items() if key not in ("model", "engine")))
+            print(f"  parity {'FAILED: ' + '; '.join(failures) if failures else 'ok'}")
+
+    sys.exit(1 if failed else 0)
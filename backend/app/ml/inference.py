@@ -0,0 +1,110 @@
+import os
+import socket
+import threading
+
+import numpy as np
+
+from app.ml import registry
+from app.ml.engines import INFERENCE_ENGINE
+from app.ml.inference_server import send_message, recv_message
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")  # Unset: run models inside this process
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", 120))
+
+_ERROR_TYPES = {"FileNotFoundError": FileNotFoundError, "ValueError": ValueError}
+# A restarted server: the cached connection is dead or the socket is briefly missing
+_RECONNECT_ERRORS = (ConnectionRefusedError, ConnectionResetError, BrokenPipeError, FileNotFoundError)
+
+# One connection per thread; the server answers requests on a connection in order
+_local = threading.local()
+
+
+def get_predictor(model_name, engine=None):
+    """Return ``predict(X) -> probabilities`` for ``model_name``.
+
+    With INFERENCE_SOCKET set the model runs in the inference server (on the
+    server's INFERENCE_ENGINE), otherwise it is loaded from the registry here
+    so a missing model fails immediately.
+    """
+    if INFERENCE_SOCKET:
+        return lambda X: remote_predict(model_name, X)
+
+    engine = registry.engine_for(model_name, engine or INFERENCE_ENGINE)
+    if engine != "keras":
+        return registry.get_runtime(model_name, engine).predict
+
+    model = registry.get_model(model_name)
+    return lambda X: model.predict(X, verbose=0)
+
+
+def predict_direct(model_name, X, engine=None):
+    """Low-latency path for a handful of beats: call the model rather than ``predict()``."""
+    if INFERENCE_SOCKET:
+        # The server already calls the model directly for batches this small
+        return remote_predict(model_name, X)
+
+    engine = registry.engine_for(model_name, engine or INFERENCE_ENGINE)
+    if engine != "keras":
+        return registry.get_runtime(model_name, engine).predict(X)
+    model = registry.get_model(model_name)
+    return registry.serving_fn(model)(X).numpy()
+
+
+def remote_predict(model_name, X, socket_path=None):
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 3:
+        X = X.reshape(X.shape[0], -1)
+
+    header, proba = _request({"op": "predict", "model": model_name}, X, socket_path)
+    return proba
+
+
+def server_stats(socket_path=None):
+    header, _ = _request({"op": "stats"}, None, socket_path)
+    return header["models"]
+
+
+def _request(header, array, socket_path):
+    socket_path = socket_path or INFERENCE_SOCKET
+    # Retry once on a fresh connection in case the server restarted since the last call
+    for attempt in (1, 2):
+        try:
+            sock = _connection(socket_path)
+            send_message(sock, header, array)
+            response, result = recv_message(sock)
+            if response is None:
+                raise ConnectionResetError("Inference server closed the connection")
+            break
+        except _RECONNECT_ERRORS:
+            _close(socket_path)
+            if attempt == 2:
+                raise
+        except OSError:
+            # Timed out (or worse): the server may still be working on it, so never resend
+            _close(socket_path)
+            raise
+
+    if not response.get("ok"):
+        error_type = _ERROR_TYPES.get(response.get("error_type"), RuntimeError)
+        raise error_type(response.get("error", "Inference failed"))
+    return response, result
+
+
+def _connection(socket_path):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    sock = connections.get(socket_path)
+    if sock is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(INFERENCE_TIMEOUT)
+        sock.connect(socket_path)
+        connections[socket_path] = sock
+    return sock
+
+
+def _close(socket_path):
+    sock = getattr(_local, "connections", {}).pop(socket_path, None)
+    if sock is not None:
+        sock.close()
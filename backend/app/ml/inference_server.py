@@ -0,0 +1,250 @@
+"""Standalone inference process that owns the Keras models and batches requests.
+
+Web workers send feature matrices over a Unix socket (see app.ml.inference);
+concurrent requests for the same model are coalesced into one forward pass
+of up to INFERENCE_MAX_BATCH_SIZE rows, waiting at most INFERENCE_MAX_WAIT_MS
+for the batch to fill:
+
+    python -m app.ml.inference_server [--socket /tmp/arrhythmia_inference.sock]
+
+Models are warmed up before the socket is bound, so ``--ping`` (exit status 0
+once the server answers) doubles as a readiness check for container health.
+
+Each message is a 4-byte big-endian header length, a JSON header and an
+optional raw little-endian float32 payload whose shape is in the header.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from app.ml import registry
+from app.ml.engines import INFERENCE_ENGINE
+
+SOCKET_PATH = os.getenv("INFERENCE_SOCKET", "/tmp/arrhythmia_inference.sock")
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 256))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5))
+PREDICT_BATCH_SIZE = int(os.getenv("INFERENCE_PREDICT_BATCH_SIZE", 1024))
+
+FLOAT32 = np.dtype('<f4')
+_HEADER_LENGTH = struct.Struct(">I")
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed mid-message")
+        received += count
+    return buffer
+
+
+def send_message(sock, header, array=None):
+    payload = b""
+    if array is not None:
+        array = np.ascontiguousarray(array, dtype=FLOAT32)
+        header = {**header, "shape": list(array.shape)}
+        payload = array.tobytes()
+    encoded = json.dumps(header).encode()
+    sock.sendall(_HEADER_LENGTH.pack(len(encoded)) + encoded + payload)
+
+
+def recv_message(sock):
+    """Return ``(header, array)``, or ``(None, None)`` if the peer closed the connection."""
+    first = sock.recv(_HEADER_LENGTH.size, 0)
+    if not first:
+        return None, None
+    if len(first) < _HEADER_LENGTH.size:
+        first += _recv_exact(sock, _HEADER_LENGTH.size - len(first))
+    (length,) = _HEADER_LENGTH.unpack(first)
+    header = json.loads(_recv_exact(sock, length))
+
+    array = None
+    if "shape" in header:
+        shape = tuple(header["shape"])
+        nbytes = int(np.prod(shape)) * FLOAT32.itemsize
+        array = np.frombuffer(_recv_exact(sock, nbytes), dtype=FLOAT32).reshape(shape)
+    return header, array
+
+
+class _Pending:
+    __slots__ = ("X", "done", "result", "error")
+
+    def __init__(self, X):
+        self.X = X
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ModelBatcher:
+    """Collects requests for one model and runs them through it together."""
+
+    def __init__(self, model_name, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{model_name}", daemon=True)
+        self._thread.start()
+
+    def predict(self, X):
+        pending = _Pending(X)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0].X)
+            deadline = time.monotonic() + self.max_wait
+
+            while rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                rows += len(pending.X)
+
+            self._execute(batch, rows)
+
+    def _execute(self, batch, rows):
+        try:
+            X = batch[0].X if len(batch) == 1 else np.concatenate([p.X for p in batch])
+            engine = registry.engine_for(self.model_name, INFERENCE_ENGINE)
+            if engine != "keras":
+                proba = registry.get_runtime(self.model_name, engine).predict(X)
+            elif rows <= self.max_batch_size:
+                model = registry.get_model(self.model_name)
+                # A direct call skips predict()'s per-call dataset setup, which dominates small batches
+                proba = registry.serving_fn(model)(X).numpy()
+            else:
+                model = registry.get_model(self.model_name)
+                proba = model.predict(X, batch_size=PREDICT_BATCH_SIZE, verbose=0)
+
+            offset = 0
+            for pending in batch:
+                pending.result = proba[offset:offset + len(pending.X)]
+                offset += len(pending.X)
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += rows
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_rows": round(self.rows / self.batches, 1) if self.batches else None
+        }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name):
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            if not registry.model_exists(model_name):
+                raise FileNotFoundError(f"Model '{model_name}' not found")
+            batcher = _batchers[model_name] = ModelBatcher(model_name)
+        return batcher
+
+
+class InferenceRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Clients keep their connection open and send one request at a time
+        while True:
+            header, X = recv_message(self.request)
+            if header is None:
+                return
+
+            op = header.get("op", "predict")
+            try:
+                if op == "predict":
+                    if X is None or X.ndim != 2:
+                        raise ValueError("predict expects a 2-D float32 feature matrix")
+                    proba = get_batcher(header["model"]).predict(X)
+                    send_message(self.request, {"ok": True}, proba)
+                elif op == "stats":
+                    with _batchers_lock:
+                        stats = {name: b.stats() for name, b in _batchers.items()}
+                    send_message(self.request, {"ok": True, "models": stats})
+                elif op == "ping":
+                    send_message(self.request, {"ok": True})
+                else:
+                    raise ValueError(f"Unknown op '{op}'")
+            except Exception as e:
+                send_message(self.request, {"ok": False, "error": str(e), "error_type": type(e).__name__})
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # Every web worker thread holds its own connection
+
+
+def serve(socket_path=SOCKET_PATH, warm_up=True):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    registry.configure_threads()
+    if warm_up:
+        registry.warm_up()
+
+    with InferenceServer(socket_path, InferenceRequestHandler) as server:
+        print(f"Inference server listening on {socket_path} ({INFERENCE_ENGINE} engine, "
+              f"max batch {MAX_BATCH_SIZE} rows, max wait {MAX_WAIT_MS} ms)")
+        server.serve_forever()
+
+
+def ping(socket_path=SOCKET_PATH, timeout=5.0):
+    """Return True if a server is listening on ``socket_path`` and answers."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            send_message(sock, {"op": "ping"})
+            header, _ = recv_message(sock)
+    except OSError:
+        return False
+    return bool(header and header.get("ok"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--no-warm-up", action="store_true", help="load models on first request instead")
+    parser.add_argument("--ping", action="store_true", help="check a running server instead of starting one")
+    args = parser.parse_args()
+
+    if args.ping:
+        raise SystemExit(0 if ping(args.socket) else 1)
+    serve(args.socket, warm_up=not args.no_warm_up)
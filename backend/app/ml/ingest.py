@@ -0,0 +1,19 @@
+import os
+
+import numpy as np
+
+FEATURE_LENGTH = 187
+CHUNK_ROWS = int(os.getenv("PREDICT_CHUNK_ROWS", 10000))
+
+
+def read_csv_chunks(stream, chunk_rows=CHUNK_ROWS):
+    import pandas as pd
+
+    # Peek at the header so the feature columns can be parsed straight to float32
+    columns = pd.read_csv(stream, nrows=0).columns
+    stream.seek(0)
+
+    dtypes = {col: np.float32 for col in columns[:FEATURE_LENGTH]}
+    dtypes.update({col: np.float64 for col in columns[FEATURE_LENGTH:]})
+
+    return pd.read_csv(stream, chunksize=chunk_rows, dtype=dtypes, engine="c")
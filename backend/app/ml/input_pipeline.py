@@ -0,0 +1,103 @@
+import math
+import os
+from functools import partial
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.heartbeat import Heartbeat
+from app.ml.dataset import (
+    EXPECTED_FEATURE_LENGTH, FETCH_BATCH_SIZE, current_max_id, labeled_heartbeats_filter,
+    new_stats, split_columns, validate_batch
+)
+from app.ml.registry import load_tensorflow
+
+# Only imported by retraining, which needs TensorFlow anyway
+tf = load_tensorflow()
+
+SHUFFLE_BUFFER = int(os.getenv("TRAINING_SHUFFLE_BUFFER", 20000))
+CACHE_DIR = os.getenv("TRAINING_CACHE_DIR")  # Optional on-disk cache so later epochs skip the DB
+VALIDATION_MODULUS = 5  # Every 5th heartbeat id (20%) is held out for validation
+
+FEATURE_BYTES = EXPECTED_FEATURE_LENGTH * 4
+
+
+def make_training_datasets(batch_size, criteria=(), max_id=None, cache_key="all",
+                           fetch_size=FETCH_BATCH_SIZE):
+    """Build train/validation ``tf.data`` pipelines that stream from the DB.
+
+    ``criteria`` narrows the labeled rows further (e.g. to an incremental
+    window); ``cache_key`` must then identify that selection so on-disk
+    caches of different windows are kept apart. Only ``fetch_size`` rows plus the shuffle buffer are held in memory at a
+    time, whatever the size of the Heartbeat table. Returns the two
+    datasets, the labeled row count of each split and the per-split skip
+    statistics of the last complete pass over the rows.
+
+    Both datasets repeat forever, so pass ``steps_per_epoch`` and
+    ``validation_steps`` (see ``steps_for``) to ``fit``.
+    """
+    engine = db.engine
+    if max_id is None:
+        max_id = current_max_id()
+    splits = {
+        "train": Heartbeat.id % VALIDATION_MODULUS != 0,
+        "validation": Heartbeat.id % VALIDATION_MODULUS == 0,
+    }
+
+    datasets, counts, stats = {}, {}, {}
+    for name, split in splits.items():
+        filters = labeled_heartbeats_filter(max_id) + list(criteria) + [split]
+        counts[name] = db.session.query(func.count(Heartbeat.id)).filter(*filters).scalar()
+        stats[name] = new_stats()
+
+        stmt = (
+            select(Heartbeat.id, Heartbeat.ecg_features, Heartbeat.heartbeat_type)
+            .where(*filters)
+            .order_by(Heartbeat.id)
+        )
+        ds = tf.data.Dataset.from_generator(
+            partial(_generate, engine, stmt, fetch_size, stats[name]),
+            output_signature=(
+                tf.TensorSpec(shape=(None,), dtype=tf.string),
+                tf.TensorSpec(shape=(None,), dtype=tf.int64),
+            )
+        )
+        ds = ds.map(_decode, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+        if CACHE_DIR:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            ds = ds.cache(os.path.join(CACHE_DIR, f"heartbeats_{cache_key}_{name}_{max_id}"))
+        if name == "train":
+            ds = ds.shuffle(SHUFFLE_BUFFER, reshuffle_each_iteration=True)
+        # Keras cannot tell where a generator ends; repeating with explicit steps keeps every epoch full
+        datasets[name] = ds.repeat().batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    return datasets["train"], datasets["validation"], counts, stats
+
+
+def steps_for(count, batch_size):
+    """Batches needed to see each of ``count`` rows once per epoch."""
+    return max(1, math.ceil(count / batch_size))
+
+
+def _generate(engine, stmt, fetch_size, stats):
+    # Runs on a tf.data thread, outside the Flask app context, so use the engine directly.
+    # The next pass starts while the current epoch is still draining the prefetch
+    # buffers, so only publish statistics once a pass is complete
+    current = new_stats()
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=fetch_size).execute(stmt)
+        for rows in result.partitions():
+            ids, features, labels = split_columns(rows)
+            indices, targets = validate_batch(ids, features, labels, current)
+            if len(indices):
+                blobs = np.array([features[i].tobytes() for i in indices], dtype=object)
+                yield blobs, targets
+    stats.clear()
+    stats.update(current)
+
+
+def _decode(blobs, targets):
+    # Longer legacy vectors are truncated to the 187-sample signal
+    signals = tf.io.decode_raw(blobs, tf.float32, little_endian=True, fixed_length=FEATURE_BYTES)
+    return tf.reshape(signals, (-1, EXPECTED_FEATURE_LENGTH, 1)), targets
@@ -0,0 +1,64 @@
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.extensions import db
+from app.models.predictionjob import PredictionJob
+from app.ml.prediction import run_prediction
+
+UPLOAD_FOLDER = os.getenv("PREDICT_UPLOAD_FOLDER", "/tmp/arrhythmia_uploads")
+MAX_PREDICT_WORKERS = int(os.getenv("PREDICT_JOB_WORKERS", 2))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_PREDICT_WORKERS, thread_name_prefix="predict-job")
+
+
+def submit_prediction_job(app, user_id, model_name, file):
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    job = PredictionJob(user_id=user_id, model_name=model_name, file_path="")
+    db.session.add(job)
+    db.session.flush()
+
+    # The request stream is gone once the response is sent, so spool it to disk first
+    job.file_path = os.path.join(UPLOAD_FOLDER, f"predict_job_{job.id}.csv")
+    file.save(job.file_path)
+    db.session.commit()
+
+    _executor.submit(run_prediction_job, app, job.id)
+    return job
+
+
+def run_prediction_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(PredictionJob, job_id)
+        if job is None:
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        def record_progress(rows):
+            job.rows_processed += rows
+
+        try:
+            with open(job.file_path, "rb") as stream:
+                result = run_prediction(job.model_name, stream, on_chunk=record_progress)
+
+            job.status = 'completed'
+            job.rows_per_second = result["rows_per_second"]
+            job.timings = result["timings"]
+            if result["performance"] is not None:
+                job.model_performance_id = result["performance"].id
+        except Exception as e:
+            traceback.print_exc()
+            db.session.rollback()
+            job = db.session.get(PredictionJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
@@ -1,9 +1,10 @@
-import tensorflow as tf
+from app.ml.registry import load_tensorflow
 
 CLASS_MAP = {'0': 0, '1': 1, '2': 2, '3': 3, '4': 4}  
 NUM_CLASSES = len(CLASS_MAP)
 
 def build_model(input_shape=(187, 1), num_classes=NUM_CLASSES):
+    tf = load_tensorflow()
     inputs = tf.keras.Input(shape=input_shape)
     x = tf.keras.layers.Conv1D(32, kernel_size=5, activation='relu')(inputs)
     x = tf.keras.layers.MaxPool1D(2)(x)
@@ -0,0 +1,219 @@
+import os
+import time
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models.heartbeat import Heartbeat
+from app.models.modelperformance import ModelPerformance
+from app.models.patient import Patient
+from app.ml.inference import get_predictor
+from app.ml.ingest import read_csv_chunks, FEATURE_LENGTH
+from app.ml.segmentation import segment_signal
+from app.ml.model import NUM_CLASSES
+from app.utils.instrumentation import recording, span
+from app.utils.summaries import update_patient_summaries
+
+PREDICTION_LABELS = {
+    0: "Normal",
+    1: "Artial Premature",
+    2: "Premature ventricular contraction",
+    3: "Fusion of ventricular and normal",
+    4: "Fusion of paced and normal"
+}
+HEARTBEAT_BATCH_SIZE = int(os.getenv("HEARTBEAT_BATCH_SIZE", 1000))
+
+
+def run_prediction(model_name, stream, on_chunk=None):
+    with recording() as recorder:
+        result = _run_prediction(model_name, stream, on_chunk)
+    result["timings"] = recorder.as_dict()
+    return result
+
+
+def _run_prediction(model_name, stream, on_chunk):
+    from sklearn.metrics import confusion_matrix
+
+    with span("load_model_and_data"):
+        predict, chunks = load_model_and_data(model_name, stream)
+
+    cm = np.zeros((NUM_CLASSES, NUM_CLASSES), dtype=np.int64)
+    has_labels = False
+    rows = 0
+    started = time.perf_counter()
+
+    # Each chunk is predicted and persisted before the next one is parsed
+    while True:
+        with span("read_csv_chunk"):
+            data = next(chunks, None)
+        if data is None:
+            break
+
+        with span("prepare_features"):
+            X, y_true = prepare_features(data)
+
+        with span("inference"):
+            predictions_proba = predict(X)
+        predicted_labels = np.argmax(predictions_proba, axis=1)
+
+        if y_true is not None:
+            has_labels = True
+            cm += confusion_matrix(y_true, predicted_labels, labels=list(range(NUM_CLASSES)))
+
+        with span("save_heartbeat_predictions"):
+            rows += save_heartbeat_predictions(
+                data, predicted_labels, predictions_proba, model_name, on_commit=on_chunk
+            )
+
+    performance = None
+    if has_labels:
+        accuracy = float(np.trace(cm) / cm.sum()) if cm.sum() else None
+        performance = save_model_performance(model_name, accuracy, cm.tolist())
+
+    with span("commit"):
+        db.session.commit()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+        "performance": performance
+    }
+
+
+def run_signal_prediction(model_name, ecg, sampling_rate, patient_id=None):
+    """Segment a raw recording into beats, classify them and optionally store them for a patient."""
+    predict = get_predictor(model_name)
+    started = time.perf_counter()
+    with span("segment_signal"):
+        beats, peak_seconds = segment_signal(ecg, sampling_rate)
+    segmented = time.perf_counter()
+
+    if len(beats):
+        with span("inference"):
+            predictions_proba = predict(beats)
+    else:
+        predictions_proba = np.empty((0, NUM_CLASSES), dtype=np.float32)
+    predicted_labels = np.argmax(predictions_proba, axis=1)
+    classified = time.perf_counter()
+
+    stored = 0
+    if patient_id is not None and len(beats):
+        stored = store_heartbeats(beats, None, np.full(len(beats), patient_id), predicted_labels,
+                                  predictions_proba, model_name)
+
+    return {
+        "peak_seconds": peak_seconds,
+        "predicted_labels": predicted_labels,
+        "confidences": np.max(predictions_proba, axis=1) if len(beats) else np.empty(0),
+        "stored": stored,
+        "segment_seconds": segmented - started,
+        "classify_seconds": classified - segmented
+    }
+
+
+def load_model_and_data(model_name, stream):
+    predict = get_predictor(model_name)
+    chunks = read_csv_chunks(stream)
+    return predict, chunks
+
+
+def prepare_features(data):
+    # Extract features (first 187 columns)
+    X = data.iloc[:, :FEATURE_LENGTH].to_numpy(dtype=np.float32)
+
+    # Use the next column as ground truth if available
+    if data.shape[1] > FEATURE_LENGTH:
+        y_true = data.iloc[:, FEATURE_LENGTH].to_numpy().astype(np.int64)
+    else:
+        y_true = None
+
+    return X, y_true
+
+
+def ensure_patients_exist(patient_ids):
+    patient_ids = {int(pid) for pid in patient_ids}
+    existing = {
+        pid for (pid,) in db.session.query(Patient.id).filter(Patient.id.in_(patient_ids))
+    }
+    missing = sorted(patient_ids - existing)
+    if missing:
+        db.session.execute(insert(Patient), [{"id": pid, "name": "tmp"} for pid in missing])
+    return missing
+
+
+def save_heartbeat_predictions(data, predicted_labels, predictions_proba, model_name,
+                               batch_size=HEARTBEAT_BATCH_SIZE, on_commit=None):
+    if data.shape[1] < FEATURE_LENGTH + 2:
+        raise ValueError("CSV must contain 187 feature columns followed by label and record columns")
+
+    return store_heartbeats(
+        signals=data.iloc[:, :FEATURE_LENGTH].to_numpy(dtype=np.float32),
+        labels=data.iloc[:, FEATURE_LENGTH].to_numpy().astype(np.int64).tolist(),
+        patient_ids=data.iloc[:, FEATURE_LENGTH + 1].to_numpy().astype(np.int64),
+        predicted_labels=predicted_labels,
+        predictions_proba=predictions_proba,
+        model_name=model_name,
+        batch_size=batch_size,
+        on_commit=on_commit
+    )
+
+
+def store_heartbeats(signals, labels, patient_ids, predicted_labels, predictions_proba, model_name,
+                     batch_size=HEARTBEAT_BATCH_SIZE, on_commit=None):
+    """Insert classified beats and fold them into the patient summaries in one transaction.
+
+    ``labels`` holds the ground truth per beat, or is None for unlabeled input.
+    """
+    patient_ids = np.asarray(patient_ids, dtype=np.int64)
+    confidences = np.max(predictions_proba, axis=1).tolist()
+    predicted_types = [PREDICTION_LABELS.get(p, "Unknown") for p in np.asarray(predicted_labels).tolist()]
+    heartbeat_types = [str(label) for label in labels] if labels is not None else [None] * len(signals)
+
+    try:
+        ensure_patients_exist(np.unique(patient_ids).tolist())
+
+        for start in range(0, len(signals), batch_size):
+            end = start + batch_size
+            rows = [
+                {
+                    "patient_id": patient_id,
+                    "ecg_features": signal,
+                    "heartbeat_type": heartbeat_type,
+                    "predicted_type": predicted_type,
+                    "prediction_confidence": confidence,
+                    "model_name": model_name,
+                }
+                for signal, heartbeat_type, patient_id, predicted_type, confidence in zip(
+                    signals[start:end],
+                    heartbeat_types[start:end],
+                    patient_ids[start:end].tolist(),
+                    predicted_types[start:end],
+                    confidences[start:end],
+                )
+            ]
+            db.session.execute(insert(Heartbeat), rows)
+
+        update_patient_summaries(patient_ids.tolist(), predicted_types, confidences)
+
+        # Lets callers record progress in the same transaction as the rows
+        if on_commit:
+            on_commit(len(signals))
+        with span("commit"):
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(signals)
+
+
+def save_model_performance(model_name, accuracy, cm):
+    performance = ModelPerformance(
+        model_name=model_name,
+        accuracy=accuracy,
+        confusion_matrix=cm
+    )
+    db.session.add(performance)
+    return performance
@@ -0,0 +1,192 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from app.ml import engines
+from app.ml.ingest import FEATURE_LENGTH
+
+MODEL_FOLDER = os.path.join(os.getcwd(), "model")
+MODEL_EXTENSION = ".h5"
+MAX_CACHED_MODELS = int(os.getenv("MODEL_CACHE_SIZE", 8))
+INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", 0))  # 0 lets TensorFlow use every core
+INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", 0))
+
+# (model_name, engine, .h5 mtime) -> keras model or engine runtime, least recently used first
+_cache = OrderedDict()
+_lock = threading.Lock()
+# loaded keras model -> graph-compiled forward pass, dropped with the model
+_serving_fns = weakref.WeakKeyDictionary()
+# (model_name, engine) pairs already reported as running in Keras instead
+_fallbacks = set()
+
+# TensorFlow takes seconds and hundreds of MB to import, so it is only loaded
+# once something needs a Keras model; auth, patient and health requests never do
+_tf = None
+_tf_lock = threading.Lock()
+_thread_limits = (INTRA_OP_THREADS, INTER_OP_THREADS)
+
+
+def load_tensorflow():
+    """Import TensorFlow on first use and apply the thread limits from configure_threads().
+
+    Code that needs TensorFlow goes through here rather than importing it
+    directly, so the limits are in place before the first op runs.
+    """
+    global _tf
+    if _tf is None:
+        with _tf_lock:
+            if _tf is None:
+                import tensorflow as tf
+                _apply_thread_limits(tf, *_thread_limits)
+                _tf = tf
+    return _tf
+
+
+def configure_threads(intra_op=INTRA_OP_THREADS, inter_op=INTER_OP_THREADS):
+    """Cap TensorFlow's thread pools so several workers on one host do not oversubscribe it.
+
+    Applied when TensorFlow is loaded, or right away if it already is; only
+    takes effect before TensorFlow runs its first op in this process.
+    """
+    global _thread_limits
+    _thread_limits = (intra_op, inter_op)
+    if _tf is not None:
+        _apply_thread_limits(_tf, intra_op, inter_op)
+
+
+def _apply_thread_limits(tf, intra_op, inter_op):
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        print(f"Could not limit TensorFlow threads: {e}")
+
+
+def model_path(model_name):
+    return os.path.join(MODEL_FOLDER, f"{model_name}{MODEL_EXTENSION}")
+
+
+def list_model_names():
+    if not os.path.isdir(MODEL_FOLDER):
+        return []
+    return sorted(
+        f[:-len(MODEL_EXTENSION)] for f in os.listdir(MODEL_FOLDER)
+        if f.endswith(MODEL_EXTENSION)
+    )
+
+
+def model_exists(model_name):
+    return os.path.exists(model_path(model_name))
+
+
+def get_model(model_name):
+    path = model_path(model_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model '{model_name}' not found")
+
+    # The mtime is part of the key so a file overwritten by retraining is reloaded
+    key = (model_name, "keras", os.path.getmtime(path))
+    model = _cached(key)
+    if model is not None:
+        return model
+
+    model = load_tensorflow().keras.models.load_model(path)
+    _store(key, model)
+    return model
+
+
+def get_runtime(model_name, engine, export=False):
+    """Return the exported ``engine`` runtime (see app.ml.engines) of ``model_name``.
+
+    With ``export`` the model is exported first when its export is missing or
+    older than the .h5 file; otherwise that raises engines.NotExportedError.
+    """
+    path = model_path(model_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model '{model_name}' not found")
+
+    key = (model_name, engine, os.path.getmtime(path))
+    runtime = _cached(key)
+    if runtime is not None:
+        return runtime
+
+    runtime = engines.load_runtime(path, engine, export=export)
+    _store(key, runtime)
+    return runtime
+
+
+def engine_for(model_name, engine):
+    """``engine``, or "keras" while ``model_name`` has no up-to-date export for it."""
+    path = model_path(model_name)
+    if engine == "keras" or not os.path.exists(path) or engines.is_exported(path, engine):
+        return engine
+    if (model_name, engine) not in _fallbacks:
+        _fallbacks.add((model_name, engine))
+        print(f"Model '{model_name}' is not exported for {engine}; running it in Keras")
+    return "keras"
+
+
+def register_model(model_name, model):
+    """Put a model that was just saved to MODEL_FOLDER straight into the cache."""
+    path = model_path(model_name)
+    _store((model_name, "keras", os.path.getmtime(path)), model)
+
+
+def _cached(key):
+    with _lock:
+        model = _cache.get(key)
+        if model is not None:
+            _cache.move_to_end(key)
+        return model
+
+
+def _store(key, model):
+    with _lock:
+        for stale in [k for k in _cache if k[:2] == key[:2] and k != key]:
+            del _cache[stale]
+        _cache[key] = model
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_MODELS:
+            _cache.popitem(last=False)
+
+
+def serving_fn(model):
+    """Return a tf.function calling ``model(x, training=False)``.
+
+    An eager call runs the LSTM op by op and ``predict()`` sets up a dataset per
+    call; for a few rows both cost far more than the compiled forward pass.
+    """
+    with _lock:
+        fn = _serving_fns.get(model)
+        if fn is None:
+            def forward(x):
+                return model(x, training=False)
+            fn = _serving_fns[model] = load_tensorflow().function(forward, reduce_retracing=True)
+    return fn
+
+
+def cached_model_names():
+    with _lock:
+        return [name for name, _, _ in _cache]
+
+
+def warm_up(model_names=None, engine=None):
+    engine = engine or engines.INFERENCE_ENGINE
+    names = model_names if model_names is not None else list_model_names()
+    for name in names[:MAX_CACHED_MODELS]:
+        try:
+            if engine == "keras":
+                model = get_model(name)
+                # Trace the serving function now rather than on the first real-time request
+                serving_fn(model)(np.zeros((1, model.input_shape[1]), dtype=np.float32))
+            else:
+                # Exports the model if needed and creates this thread's interpreters
+                get_runtime(name, engine, export=True).predict(np.zeros((1, FEATURE_LENGTH), dtype=np.float32))
+            print(f"Model '{name}' loaded into registry ({engine}).")
+        except Exception as e:
+            print(f"Could not preload model '{name}': {e}")
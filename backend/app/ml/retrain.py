@@ -1,87 +1,145 @@
 from app.models.heartbeat import Heartbeat
 from app.models.retrainedmodel import TrainedModel
 from app.ml.model import build_model, CLASS_MAP
-from app.ml.labels import label_to_int
+from app.ml.dataset import build_training_set, current_max_id, replay_sample, EXPECTED_FEATURE_LENGTH
+from app.ml import registry
+from app.ml.engines import INFERENCE_ENGINE
 from app.extensions import db
-from datetime import datetime
+from sqlalchemy import and_, or_
+import logging
 import os
-import numpy as np
-import tensorflow as tf
 
-MODEL_FOLDER = os.path.join(os.getcwd(), "model")  
-EXPECTED_FEATURE_LENGTH = 187
-VALID_LABELS = set(CLASS_MAP.keys())
-MAJOR_VERSION = 1 # Increment this for major changes
+logger = logging.getLogger(__name__)
 
-def run_retraining(app, user_id):
+MODEL_FOLDER = registry.MODEL_FOLDER
+MAJOR_VERSION = 1 # Increment this for major changes
+EPOCHS = 10
+BATCH_SIZE = 64
+TRAINING_INPUT = os.getenv("TRAINING_INPUT", "stream")  # "stream" (tf.data from the DB) or "memory"
+TRAINING_MODES = ("full", "incremental")
+INCREMENTAL_EPOCHS = int(os.getenv("INCREMENTAL_EPOCHS", 3))
+FINE_TUNE_LEARNING_RATE = float(os.getenv("FINE_TUNE_LEARNING_RATE", 1e-4))
+
+def run_retraining(app, user_id, callbacks=None, mode="full", replay_fraction=0.0):
     with app.app_context():
-        heartbeats = Heartbeat.query.filter(Heartbeat.heartbeat_type.isnot(None)).all()
-        print(f"Loaded {len(heartbeats)} heartbeats from DB")
-
-        EXPECTED_FEATURE_LENGTH = 187
-        VALID_LABELS = set(CLASS_MAP.keys())
-
-        valid_heartbeats = []
-        skipped = []
-
-        for hb in heartbeats:
-            reasons = []
-
-            if not isinstance(hb.ecg_features, list):
-                reasons.append("features not list")
-                skipped.append((hb.id, reasons))
-                continue
-
-            if len(hb.ecg_features) < EXPECTED_FEATURE_LENGTH:
-                reasons.append(f"too short: {len(hb.ecg_features)}")
-            elif len(hb.ecg_features) > EXPECTED_FEATURE_LENGTH + 2:
-                reasons.append(f"too long: {len(hb.ecg_features)}")
-
-            try:
-                label_val = hb.ecg_features[EXPECTED_FEATURE_LENGTH] if len(hb.ecg_features) > EXPECTED_FEATURE_LENGTH else hb.heartbeat_type
-                label = str(int(label_val))
-                if label not in VALID_LABELS:
-                    reasons.append(f"invalid label: {label}")
-            except Exception as e:
-                reasons.append(f"label error: {e}")
-
-            if reasons:
-                skipped.append((hb.id, reasons))
-                continue
-
-            features = hb.ecg_features[:EXPECTED_FEATURE_LENGTH]
-            valid_heartbeats.append((features, label))
-
-        print(f"Total heartbeats: {len(heartbeats)}")
-        print(f"Valid heartbeats: {len(valid_heartbeats)}")
-        print(f"Skipped: {len(skipped)}")
-        print(f"Sample issues: {skipped[:5]}")
-
-        if not valid_heartbeats:
-            raise ValueError("No valid heartbeats to train on.")  
-
-        X = np.stack([f for f, _ in valid_heartbeats]).reshape(-1, EXPECTED_FEATURE_LENGTH, 1)
-        y = np.array([label_to_int(l) for _, l in valid_heartbeats])
-
-        model = build_model(input_shape=(EXPECTED_FEATURE_LENGTH, 1), num_classes=len(CLASS_MAP))
-        model.fit(X, y, epochs=10, batch_size=64, validation_split=0.2)
+        max_id = current_max_id()
+        base = TrainedModel.query.order_by(TrainedModel.id.desc()).first() if mode == "incremental" else None
+
+        if mode == "incremental" and base is None:
+            logger.warning("No trained model to start from, falling back to full retraining")
+            mode = "full"
+
+        if mode == "incremental":
+            model, criteria, data_from_id = _incremental_setup(base, replay_fraction)
+            epochs = INCREMENTAL_EPOCHS
+            cache_key = f"inc{data_from_id}_r{int(replay_fraction * 1000)}"
+        else:
+            model = build_model(input_shape=(EXPECTED_FEATURE_LENGTH, 1), num_classes=len(CLASS_MAP))
+            criteria, data_from_id, replay_fraction = [], None, None
+            epochs = EPOCHS
+            cache_key = "full"
+
+        if TRAINING_INPUT == "memory":
+            X, y, stats = build_training_set(criteria=criteria, max_id=max_id)
+            logger.info("Training set: %d of %d labeled heartbeats usable", stats['valid'], stats['total'])
+            _log_skipped(stats)
+
+            if not len(X):
+                raise ValueError("No valid heartbeats to train on.")
+
+            model.fit(X, y, epochs=epochs, batch_size=BATCH_SIZE, validation_split=0.2, callbacks=callbacks)
+            sample_count = len(X)
+        else:
+            from app.ml.input_pipeline import make_training_datasets, steps_for
+
+            train_ds, val_ds, counts, stats = make_training_datasets(
+                BATCH_SIZE, criteria=criteria, max_id=max_id, cache_key=cache_key
+            )
+            logger.info("Streaming %d training / %d validation heartbeats", counts['train'], counts['validation'])
+
+            if not counts["train"]:
+                raise ValueError("No valid heartbeats to train on.")
+
+            # The datasets repeat, so the epoch length comes from the row counts
+            model.fit(
+                train_ds,
+                validation_data=val_ds if counts["validation"] else None,
+                steps_per_epoch=steps_for(counts["train"], BATCH_SIZE),
+                validation_steps=steps_for(counts["validation"], BATCH_SIZE) if counts["validation"] else None,
+                epochs=epochs,
+                callbacks=callbacks
+            )
+            _log_skipped(stats["train"], "last pass")
+            sample_count = stats["train"]["valid"] + stats["validation"]["valid"]
 
         os.makedirs(MODEL_FOLDER, exist_ok=True)
         last = TrainedModel.query.order_by(TrainedModel.id.desc()).first()
         next_minor = int(last.version.split('.')[-1]) + 1 if last else 1
         version = f"1.{next_minor}"
 
-        filename = f"model_cnn_lstm_v{version.replace('.', '_')}.h5"
-        model_path = os.path.join(MODEL_FOLDER, filename)
+        model_name = f"model_cnn_lstm_v{version.replace('.', '_')}"
+        model_path = registry.model_path(model_name)
         model.save(model_path)
+        registry.register_model(model_name, model)
+        if INFERENCE_ENGINE != "keras":
+            from app.ml.export_models import export_model
+
+            # Export now rather than on the first prediction with the new version
+            export_model(model_path, INFERENCE_ENGINE, model=model)
 
         new_entry = TrainedModel(
             version=version,
             file_path=model_path,
-            user_id=user_id
+            user_id=user_id,
+            training_mode=mode,
+            base_model_id=base.id if base else None,
+            data_from_id=data_from_id,
+            data_to_id=max_id,
+            replay_fraction=replay_fraction,
+            sample_count=sample_count
         )
         db.session.add(new_entry)
         db.session.commit()
 
-        print(f"Model version {version} saved to {model_path}")
-        return version
\ No newline at end of file
+        logger.info("Model version %s (%s) saved to %s", version, mode, model_path)
+        return version
+
+
+def _log_skipped(stats, when="loading"):
+    skipped = sum(stats['skipped'].values())
+    level = logging.WARNING if skipped else logging.INFO
+    logger.log(level, "Skipped %d heartbeats (%s): %s (sample ids: %s)",
+               skipped, when, stats['skipped'], stats['samples'])
+
+
+def _incremental_setup(base, replay_fraction):
+    tf = registry.load_tensorflow()
+    # Start from a fresh copy: the registry's cached instance is serving predictions
+    model = tf.keras.models.load_model(base.file_path)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=FINE_TUNE_LEARNING_RATE),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    # Versions trained before data windows were recorded fall back to their creation time
+    if base.data_to_id is not None:
+        data_from_id = base.data_to_id
+        new_rows = Heartbeat.id > base.data_to_id
+    else:
+        data_from_id = db.session.query(db.func.max(Heartbeat.id)).filter(
+            Heartbeat.timestamp <= base.created_at
+        ).scalar() or 0
+        new_rows = Heartbeat.id > data_from_id
+
+    if not Heartbeat.query.filter(Heartbeat.heartbeat_type.isnot(None), new_rows).count():
+        raise ValueError(f"No heartbeats labeled since model version {base.version}")
+
+    if replay_fraction > 0:
+        criteria = [or_(new_rows, and_(Heartbeat.id <= data_from_id, replay_sample(replay_fraction)))]
+    else:
+        criteria = [new_rows]
+
+    logger.info("Fine-tuning version %s on heartbeats after id %d (replaying %.0f%% of older data)",
+                base.version, data_from_id, replay_fraction * 100)
+    return model, criteria, data_from_id
@@ -0,0 +1,58 @@
+"""Keras callbacks for retraining jobs, kept apart so web workers can import
+app.ml.training_jobs without loading TensorFlow."""
+import time
+
+from app.extensions import db
+from app.models.trainingjob import TrainingJob
+from app.ml.registry import load_tensorflow
+from app.ml.training_jobs import PROGRESS_INTERVAL, TrainingCancelled
+
+tf = load_tensorflow()
+
+
+class TrainingProgressCallback(tf.keras.callbacks.Callback):
+    """Writes epoch/batch progress to a TrainingJob row and stops on cancel."""
+
+    def __init__(self, job_id, interval=PROGRESS_INTERVAL):
+        super().__init__()
+        self.job_id = job_id
+        self.interval = interval
+        self.epoch = 0
+        self._last_write = 0.0
+
+    def on_train_begin(self, logs=None):
+        self._update(total_epochs=self.params.get('epochs'), total_batches=self.params.get('steps'))
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch + 1
+        self._update(epoch=self.epoch, batch=0)
+
+    def on_train_batch_end(self, batch, logs=None):
+        if time.monotonic() - self._last_write < self.interval:
+            return
+        logs = logs or {}
+        self._update(batch=batch + 1, loss=_metric(logs, 'loss'), accuracy=_metric(logs, 'accuracy'))
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        self._update(
+            batch=self.params.get('steps') or 0,
+            loss=_metric(logs, 'loss'),
+            accuracy=_metric(logs, 'accuracy'),
+            val_loss=_metric(logs, 'val_loss'),
+            val_accuracy=_metric(logs, 'val_accuracy')
+        )
+
+    def _update(self, **fields):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        TrainingJob.query.filter_by(id=self.job_id).update(fields)
+        db.session.commit()
+        self._last_write = time.monotonic()
+
+        if db.session.query(TrainingJob.cancel_requested).filter_by(id=self.job_id).scalar():
+            raise TrainingCancelled("Training cancelled by user")
+
+
+def _metric(logs, name):
+    value = logs.get(name)
+    return float(value) if value is not None else None
@@ -0,0 +1,156 @@
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from datetime import datetime
+
+from app.extensions import db
+from app.models.trainingjob import TrainingJob
+from app.ml.retrain import run_retraining, EPOCHS, INCREMENTAL_EPOCHS
+
+PROGRESS_INTERVAL = float(os.getenv("TRAINING_PROGRESS_INTERVAL", 2.0))
+# The training process touches updated_at this often, even while loading data;
+# a job silent for longer than the timeout is treated as dead by every worker
+HEARTBEAT_INTERVAL = float(os.getenv("TRAINING_HEARTBEAT_INTERVAL", 30.0))
+HEARTBEAT_TIMEOUT = float(os.getenv("TRAINING_HEARTBEAT_TIMEOUT", 300.0))
+ACTIVE_STATUSES = ('queued', 'running')
+
+# TensorFlow is not fork-safe once initialised in the web worker, so always spawn
+_mp = multiprocessing.get_context("spawn")
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    try:
+        # A zombie still answers signals; only its parent can reap it, so check the state too
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rpartition(")")[2].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+
+def _heartbeat_expired(job):
+    last_seen = job.updated_at or job.created_at
+    return last_seen is not None and (datetime.utcnow() - last_seen).total_seconds() > HEARTBEAT_TIMEOUT
+
+
+def start_training_job(user_id, mode="full", replay_fraction=0.0):
+    # Reap training processes this worker started, so a finished one is not mistaken for a live one
+    _mp.active_children()
+
+    active = TrainingJob.query.filter(TrainingJob.status.in_(ACTIVE_STATUSES)).first()
+    if active and active.pid and not _process_alive(active.pid):
+        # The training process died without reporting back (e.g. OOM kill)
+        _fail_abandoned(active, "Training process exited unexpectedly")
+        active = None
+    elif active and _heartbeat_expired(active):
+        # Hung, or started on a host whose processes we cannot see; ask it to stop in case it wakes up
+        _fail_abandoned(active, f"No progress from the training process for {HEARTBEAT_TIMEOUT:.0f}s")
+        active = None
+    if active:
+        raise RuntimeError("A retraining job is already in progress")
+
+    job = TrainingJob(
+        user_id=user_id,
+        mode=mode,
+        replay_fraction=replay_fraction,
+        total_epochs=INCREMENTAL_EPOCHS if mode == "incremental" else EPOCHS
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    process = _mp.Process(target=_run_training_process, args=(job.id,), name=f"retrain-{job.id}")
+    process.start()
+
+    job.pid = process.pid
+    db.session.commit()
+    return job
+
+
+def _fail_abandoned(job, error):
+    job.status = 'failed'
+    job.error = error
+    job.cancel_requested = True
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def cancel_training_job(job):
+    if job.status not in ACTIVE_STATUSES:
+        return job
+
+    # A running job notices the flag at its next progress write
+    job.cancel_requested = True
+    if job.status == 'queued':
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def _run_training_process(job_id):
+    # Runs in a fresh interpreter: build our own app and skip preloading inference models
+    os.environ["MODEL_WARMUP"] = "0"
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(processName)s] %(name)s: %(message)s")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        job = db.session.get(TrainingJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        user_id, mode, replay_fraction = job.user_id, job.mode, job.replay_fraction
+
+    from app.ml.training_callbacks import TrainingProgressCallback
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(app, job_id, stop), name="training-heartbeat", daemon=True).start()
+    try:
+        version = run_retraining(
+            app, user_id,
+            callbacks=[TrainingProgressCallback(job_id)],
+            mode=mode,
+            replay_fraction=replay_fraction
+        )
+        _finish(app, job_id, 'completed', model_version=version)
+    except TrainingCancelled:
+        _finish(app, job_id, 'cancelled')
+    except Exception as e:
+        traceback.print_exc()
+        _finish(app, job_id, 'failed', error=str(e))
+    finally:
+        stop.set()
+
+
+def _heartbeat(app, job_id, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        with app.app_context():
+            try:
+                TrainingJob.query.filter_by(id=job_id).update({'updated_at': datetime.utcnow()})
+                db.session.commit()
+            except Exception:
+                # A missed beat is harmless; the next one or a progress write will land
+                db.session.rollback()
+
+
+def _finish(app, job_id, status, **fields):
+    with app.app_context():
+        db.session.rollback()
+        job = db.session.get(TrainingJob, job_id)
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.session.commit()
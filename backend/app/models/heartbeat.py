@@ -1,13 +1,13 @@
 from app.extensions import db
 from datetime import datetime
-from sqlalchemy import JSON
+from app.models.types import Float32Array
 
 class Heartbeat(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
-    ecg_features = db.Column(JSON)  # Stores the 188-length ECG feature vector
+    ecg_features = db.Column(Float32Array)  # Stores the 187-length ECG feature vector as packed float32
 
     heartbeat_type = db.Column(db.String(5))  # Ground truth label
     predicted_type = db.Column(db.String(64))  # e.g., 'Normal', 'Arrhythmic'
@@ -16,5 +16,18 @@ class Heartbeat(db.Model):
 
     patient = db.relationship('Patient', backref=db.backref('heartbeats', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_heartbeat_patient_id_id', 'patient_id', 'id'),
+        db.Index('ix_heartbeat_patient_id_timestamp', 'patient_id', 'timestamp'),
+        db.Index('ix_heartbeat_predicted_type', 'predicted_type'),
+        # Retraining walks labeled beats in id order; partial where supported. The label leads
+        # so MySQL can range-scan `heartbeat_type IS NOT NULL` instead of reading the whole index
+        db.Index(
+            'ix_heartbeat_labeled', 'heartbeat_type', 'id',
+            sqlite_where=heartbeat_type.isnot(None),
+            postgresql_where=heartbeat_type.isnot(None)
+        ),
+    )
+
     def __repr__(self):
         return f'<Heartbeat for Patient {self.patient_id}>'
\ No newline at end of file
@@ -8,5 +8,10 @@ class ModelPerformance(db.Model):
     confusion_matrix = db.Column(db.JSON, nullable=True)  # Stored as a nested list
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_model_performance_model_name_timestamp', 'model_name', 'timestamp'),
+        db.Index('ix_model_performance_timestamp', 'timestamp'),
+    )
+
     def __repr__(self):
         return f"<ModelPerformance {self.model_name} - {self.accuracy}>"
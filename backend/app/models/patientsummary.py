@@ -0,0 +1,27 @@
+from app.extensions import db
+from datetime import datetime
+
+class PatientSummary(db.Model):
+    # Rollup of a patient's heartbeats, maintained on every heartbeat insert
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), primary_key=True)
+    total_heartbeats = db.Column(db.Integer, nullable=False, default=0)
+    class_counts = db.Column(db.JSON, nullable=False, default=dict)  # predicted_type -> count
+    confidence_sum = db.Column(db.Float, nullable=False, default=0.0)
+    confidence_count = db.Column(db.Integer, nullable=False, default=0)
+    last_prediction_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    patient = db.relationship('Patient', backref=db.backref('summary', uselist=False, lazy=True))
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else None
+
+    @property
+    def most_common_prediction(self):
+        if not self.class_counts:
+            return None
+        return max(self.class_counts.items(), key=lambda item: (item[1], item[0]))[0]
+
+    def __repr__(self):
+        return f'<PatientSummary for Patient {self.patient_id}>'
@@ -0,0 +1,35 @@
+from app.extensions import db
+from datetime import datetime
+
+class PredictionJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    model_name = db.Column(db.String(100), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)  # Upload spooled to disk until the job finishes
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_per_second = db.Column(db.Float, nullable=True)
+    model_performance_id = db.Column(db.Integer, db.ForeignKey('model_performance.id'), nullable=True)
+    timings = db.Column(db.JSON, nullable=True)  # Per-stage seconds and SQL usage of the run
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'model_name': self.model_name,
+            'status': self.status,
+            'rows_processed': self.rows_processed,
+            'rows_per_second': self.rows_per_second,
+            'model_performance_id': self.model_performance_id,
+            'timings': self.timings,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<PredictionJob {self.id} {self.status}>'
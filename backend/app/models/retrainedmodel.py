@@ -6,4 +6,12 @@ class TrainedModel(db.Model):
     version = db.Column(db.String(10), nullable=False, unique=True)  
     file_path = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, nullable=False)  
\ No newline at end of file
+    user_id = db.Column(db.Integer, nullable=False)
+
+    # Which labeled heartbeats this version was trained on
+    training_mode = db.Column(db.String(20), nullable=False, default='full')  # full or incremental
+    base_model_id = db.Column(db.Integer, db.ForeignKey('trained_model.id'), nullable=True)
+    data_from_id = db.Column(db.Integer, nullable=True)  # Exclusive lower heartbeat id; None means from the start
+    data_to_id = db.Column(db.Integer, nullable=True)  # Inclusive upper heartbeat id
+    replay_fraction = db.Column(db.Float, nullable=True)
+    sample_count = db.Column(db.Integer, nullable=True)
@@ -0,0 +1,54 @@
+from app.extensions import db
+from datetime import datetime
+
+class TrainingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed, cancelled
+    pid = db.Column(db.Integer, nullable=True)  # Training process, not the web worker
+    mode = db.Column(db.String(20), nullable=False, default='full')  # full or incremental
+    replay_fraction = db.Column(db.Float, nullable=False, default=0.0)
+
+    epoch = db.Column(db.Integer, nullable=False, default=0)
+    total_epochs = db.Column(db.Integer, nullable=True)
+    batch = db.Column(db.Integer, nullable=False, default=0)
+    total_batches = db.Column(db.Integer, nullable=True)
+    loss = db.Column(db.Float, nullable=True)
+    accuracy = db.Column(db.Float, nullable=True)
+    val_loss = db.Column(db.Float, nullable=True)
+    val_accuracy = db.Column(db.Float, nullable=True)
+
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    model_version = db.Column(db.String(10), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'mode': self.mode,
+            'replay_fraction': self.replay_fraction,
+            'epoch': self.epoch,
+            'total_epochs': self.total_epochs,
+            'batch': self.batch,
+            'total_batches': self.total_batches,
+            'loss': self.loss,
+            'accuracy': self.accuracy,
+            'val_loss': self.val_loss,
+            'val_accuracy': self.val_accuracy,
+            'cancel_requested': self.cancel_requested,
+            'model_version': self.model_version,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<TrainingJob {self.id} {self.status}>'
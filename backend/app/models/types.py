@@ -0,0 +1,37 @@
+import json
+
+import numpy as np
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+FLOAT32 = np.dtype('<f4')
+
+
+def decode_float32(value):
+    if value is None:
+        return None
+    # Rows written before the binary migration still hold JSON text
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=FLOAT32)
+    return np.frombuffer(value, dtype=FLOAT32)
+
+
+class Float32Array(TypeDecorator):
+    """Stores a 1-D float vector as packed little-endian float32 bytes.
+
+    Values are read back as read-only ``np.frombuffer`` views over the
+    row's bytes, so no per-element Python objects are created.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return np.ascontiguousarray(value, dtype=FLOAT32).tobytes()
+
+    def process_result_value(self, value, dialect):
+        return decode_float32(value)
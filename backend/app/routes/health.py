@@ -0,0 +1,114 @@
+from flask import Blueprint, Response, jsonify, send_file
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.utils.db_pool import pool_status
+from app.utils.instrumentation import metrics_response, operator_only, profile_path
+from app.utils.schema import schema_status
+
+bp = Blueprint('health', __name__)
+
+
+@bp.route('/health', methods=['GET'])
+def health():
+    """
+        Liveness check, does not touch the database
+        ---
+        tags:
+          - Health
+        responses:
+          200:
+            description: The process is up
+    """
+    return jsonify({"status": "ok"}), 200
+
+
+@bp.route('/ready', methods=['GET'])
+def ready():
+    """
+        Readiness check: the database answers and its schema is migrated
+        ---
+        tags:
+          - Health
+        responses:
+          200:
+            description: Ready to serve traffic
+          503:
+            description: Database unreachable, migrations pending or migration scripts unreadable
+    """
+    try:
+        is_ready, details = schema_status()
+    except SQLAlchemyError as e:
+        return jsonify({"status": "unavailable", "error": str(e.__class__.__name__)}), 503
+    except Exception as e:
+        # e.g. the migration scripts cannot be read from this working directory
+        print(f"Readiness check failed: {e}")
+        return jsonify({"status": "unavailable", "error": str(e.__class__.__name__)}), 503
+
+    if not is_ready:
+        return jsonify({"status": "migrations_pending", **details}), 503
+    return jsonify({"status": "ready", **details}), 200
+
+
+@bp.route('/health/db-pool', methods=['GET'])
+@operator_only
+def db_pool():
+    """
+        Connection pool occupancy and checkout wait statistics for this worker
+        ---
+        tags:
+          - Health
+        responses:
+          200:
+            description: Pool size, checked out/overflow connections, checkout count, wait times and timeouts
+          403:
+            description: Not from an allowed network and no valid metrics token
+    """
+    return jsonify(pool_status(db.engine)), 200
+
+
+@bp.route('/metrics', methods=['GET'])
+@operator_only
+def metrics():
+    """
+        Prometheus metrics: request latency, pipeline span and SQL statement histograms
+        ---
+        tags:
+          - Health
+        produces:
+          - text/plain
+        responses:
+          200:
+            description: Metrics in the Prometheus text exposition format
+          403:
+            description: Not from an allowed network and no valid metrics token
+    """
+    body, content_type = metrics_response()
+    return Response(body, content_type=content_type)
+
+
+@bp.route('/health/profiles/<profile_id>', methods=['GET'])
+@operator_only
+def profile(profile_id):
+    """
+        Download a request profile by the id returned in X-Profile-Id
+        ---
+        tags:
+          - Health
+        parameters:
+          - name: profile_id
+            in: path
+            type: string
+            required: true
+        responses:
+          200:
+            description: cProfile stats (.prof) or a pyinstrument HTML report
+          403:
+            description: Not from an allowed network and no valid metrics token
+          404:
+            description: No such profile
+    """
+    path = profile_path(profile_id)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, as_attachment=True)
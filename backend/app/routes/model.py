@@ -1,36 +1,44 @@
 import os
-import pandas as pd
-import numpy as np
-import tensorflow as tf
+import queue
 
+import numpy as np
 from flask import Blueprint, request, jsonify, current_app
-from werkzeug.utils import secure_filename
 
 from app.extensions import db
-from app.models.prediction import Prediction
-from app.models.user import User
 from app.utils.files import allowed_file  
 from app.utils.jwt import verify_token 
-from sklearn.metrics import accuracy_score, confusion_matrix
 
-from app.models.heartbeat import Heartbeat
 from app.models.modelperformance import ModelPerformance
-from app.models.patient import Patient
-
-import threading
-from app.ml.retrain import run_retraining
+from app.models.predictionjob import PredictionJob
+
+from app.models.trainingjob import TrainingJob
+from app.ml.training_jobs import start_training_job, cancel_training_job, ACTIVE_STATUSES
+from app.ml.retrain import TRAINING_MODES
+from app.ml import registry
+from app.ml.jobs import submit_prediction_job
+from app.ml.prediction import PREDICTION_LABELS, run_signal_prediction
+from app.ml.segmentation import read_signal, SIGNAL_FORMATS
+from app.ml.inference import predict_direct
+from app.ml.beat_writer import enqueue_heartbeats
+from app.ml.ingest import FEATURE_LENGTH
+from app.utils.instrumentation import span
 
 bp = Blueprint("predict", __name__, url_prefix="/model")
 bpM = Blueprint('ml', __name__, url_prefix='/model')
 
-MODEL_FOLDER = os.path.join(os.getcwd(), "model")  # Should point to backend/model/
-PREDICTION_LABELS = {
-    0: "Normal",
-    1: "Artial Premature",
-    2: "Premature ventricular contraction",
-    3: "Fusion of ventricular and normal",
-    4: "Fusion of paced and normal"
-}
+CLASSIFY_MAX_BEATS = int(os.getenv("CLASSIFY_MAX_BEATS", 64))
+
+
+def _form_number(name, cast, default=None):
+    """Parse an optional numeric form field, naming it when it is not a number."""
+    value = request.form.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        kind = "an integer" if cast is int else "a number"
+        raise ValueError(f"{name} must be {kind}") from None
 
 
 @bp.route("/predict", methods=["POST"])
@@ -68,14 +76,20 @@ def predict():
           Optionally include a "type" column for ground truth labels.
 
     responses:
-      200:
-        description: Prediction successful
+      202:
+        description: Prediction job queued; poll /model/jobs/{job_id} for progress
         schema:
           type: object
           properties:
             message:
               type: string
-              example: Prediction successful
+              example: Prediction job queued
+            job_id:
+              type: integer
+              example: 12
+            status:
+              type: string
+              example: queued
       400:
         description: Bad request (missing parameters or invalid file)
         schema:
@@ -112,28 +126,380 @@ def predict():
     try:
         user_id = authenticate_request()
         model_name, file, model_path = validate_input()
-        tmp_path = save_uploaded_file(file)
-        model, data = load_model_and_data(model_path, tmp_path)
-        X, y_true = prepare_features(data)
-        
-        predictions_proba = model.predict(X)
-        predicted_labels = np.argmax(predictions_proba, axis=1).tolist()
 
-        accuracy = accuracy_score(y_true, predicted_labels) if y_true else None
-        cm = confusion_matrix(y_true, predicted_labels).tolist() if y_true else None
+        app = current_app._get_current_object()
+        job = submit_prediction_job(app, user_id, model_name, file)
+
+        return jsonify({
+            "message": "Prediction job queued",
+            "job_id": job.id,
+            "status": job.status
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/jobs/<int:job_id>", methods=["GET"])
+def get_prediction_job(job_id):
+    """
+    Get the status and progress of a prediction job
+    ---
+    tags:
+      - Model
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: Bearer JWT token (e.g., "Bearer YOUR_TOKEN")
+      - name: job_id
+        in: path
+        type: integer
+        required: true
+        description: ID returned by /model/predict
+    responses:
+      200:
+        description: Job status
+        schema:
+          type: object
+          properties:
+            id:
+              type: integer
+            model_name:
+              type: string
+            status:
+              type: string
+              enum: [queued, running, completed, failed]
+            rows_processed:
+              type: integer
+              example: 20000
+            rows_per_second:
+              type: number
+            model_performance_id:
+              type: integer
+            timings:
+              type: object
+              description: Seconds and call count per pipeline stage, plus SQL statement count and time
+            error:
+              type: string
+      401:
+        description: Unauthorized or invalid JWT
+      404:
+        description: Job not found
+    """
+    try:
+        authenticate_request()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
+    job = db.session.get(PredictionJob, job_id)
+    if not job:
+        return jsonify({"error": "Prediction job not found"}), 404
+
+    return jsonify(job.to_dict()), 200
+
+
+@bp.route("/classify", methods=["POST"])
+def classify():
+    """
+    Classify one or a few heartbeats synchronously, for bedside monitors
+    ---
+    tags:
+      - Model
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: Bearer JWT token (e.g., "Bearer YOUR_TOKEN")
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          required:
+            - model_name
+            - beats
+          properties:
+            model_name:
+              type: string
+              example: best_model_cnn_lstm
+            beats:
+              type: array
+              description: One 187-sample beat, or a list of up to CLASSIFY_MAX_BEATS beats
+              items:
+                type: array
+                items:
+                  type: number
+            patient_id:
+              type: integer
+              description: When given, the beats and predictions are stored for this patient in the background
+    responses:
+      200:
+        description: Predictions in the order the beats were sent
+        schema:
+          type: object
+          properties:
+            model_name:
+              type: string
+            predictions:
+              type: array
+              items:
+                type: object
+                properties:
+                  predicted_class:
+                    type: integer
+                  predicted_type:
+                    type: string
+                  confidence:
+                    type: number
+                  probabilities:
+                    type: array
+                    items:
+                      type: number
+            queued:
+              type: integer
+              description: Number of beats queued for storage
+      400:
+        description: Malformed body or beats of the wrong length
+      401:
+        description: Unauthorized or invalid JWT
+      404:
+        description: Model not found
+      503:
+        description: Storage queue is full; retry later
+    """
+    try:
+        authenticate_request()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "JSON object expected"}), 400
+    model_name = body.get("model_name")
+    if not model_name:
+        return jsonify({"error": "Missing model_name"}), 400
+    if not registry.model_exists(model_name):
+        return jsonify({"error": f"Model '{model_name}' not found"}), 404
+
+    try:
+        X = np.asarray(body.get("beats"), dtype=np.float32)
+    except (TypeError, ValueError):
+        return jsonify({"error": "beats must be numeric"}), 400
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+    if X.ndim != 2 or X.shape[1] != FEATURE_LENGTH or not 0 < len(X) <= CLASSIFY_MAX_BEATS:
+        return jsonify({
+            "error": f"beats must be 1 to {CLASSIFY_MAX_BEATS} vectors of {FEATURE_LENGTH} samples"
+        }), 400
+
+    patient_id = body.get("patient_id")
+    # bool is an int subclass; true/false must not land on patients 1 and 0
+    if patient_id is not None and (isinstance(patient_id, bool) or not isinstance(patient_id, int)):
+        return jsonify({"error": "patient_id must be an integer"}), 400
+
+    with span("inference"):
+        proba = predict_direct(model_name, X)
+    classes = np.argmax(proba, axis=1).tolist()
+    confidences = np.max(proba, axis=1).tolist()
+    predictions = [
+        {
+            "predicted_class": cls,
+            "predicted_type": PREDICTION_LABELS.get(cls, "Unknown"),
+            "confidence": confidence,
+            "probabilities": probabilities
+        }
+        for cls, confidence, probabilities in zip(classes, confidences, proba.tolist())
+    ]
+
+    queued = 0
+    if patient_id is not None:
+        rows = [
+            {
+                "patient_id": patient_id,
+                "ecg_features": signal,
+                "heartbeat_type": None,
+                "predicted_type": prediction["predicted_type"],
+                "prediction_confidence": prediction["confidence"],
+                "model_name": model_name
+            }
+            for signal, prediction in zip(X, predictions)
+        ]
+        try:
+            enqueue_heartbeats(current_app._get_current_object(), rows)
+        except queue.Full:
+            return jsonify({"error": "Heartbeat storage is backlogged, retry later"}), 503
+        queued = len(rows)
+
+    return jsonify({"model_name": model_name, "predictions": predictions, "queued": queued}), 200
+
+
+@bp.route("/predict-signal", methods=["POST"])
+def predict_signal():
+    """
+    Segment a raw ECG recording into beats and classify them
+    ---
+    tags:
+      - Model
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: Bearer JWT token (e.g., "Bearer YOUR_TOKEN")
+      - name: model_name
+        in: formData
+        type: string
+        required: true
+      - name: file
+        in: formData
+        type: file
+        required: true
+        description: Continuous ECG signal (CSV column, raw binary samples, or a WFDB .dat file)
+      - name: header
+        in: formData
+        type: file
+        required: false
+        description: WFDB .hea header, required with format=wfdb
+      - name: format
+        in: formData
+        type: string
+        enum: [csv, binary, wfdb]
+        default: csv
+      - name: sampling_rate
+        in: formData
+        type: number
+        required: false
+        description: Samples per second; required unless the WFDB header provides it
+      - name: channel
+        in: formData
+        type: string
+        required: false
+        description: Lead name or index; defaults to the first lead
+      - name: dtype
+        in: formData
+        type: string
+        enum: [float32, float64, int16]
+        default: float32
+        description: Sample type for binary input
+      - name: channels
+        in: formData
+        type: integer
+        default: 1
+        description: Number of interleaved leads in binary input
+      - name: patient_id
+        in: formData
+        type: integer
+        required: false
+        description: When given, the detected beats and predictions are stored for this patient
+    responses:
+      200:
+        description: Beat positions and predictions, column-wise
+        schema:
+          type: object
+          properties:
+            model_name:
+              type: string
+            duration_seconds:
+              type: number
+            beats:
+              type: integer
+            class_counts:
+              type: object
+            r_peak_seconds:
+              type: array
+              items:
+                type: number
+            predicted_types:
+              type: array
+              items:
+                type: string
+            confidences:
+              type: array
+              items:
+                type: number
+            stored:
+              type: integer
+      400:
+        description: Missing or unreadable signal, or a non-numeric form field
+      401:
+        description: Unauthorized or invalid JWT
+      404:
+        description: Model not found
+    """
+    try:
+        authenticate_request()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
+    model_name = request.form.get("model_name")
+    if not model_name:
+        return jsonify({"error": "Missing model_name in form data"}), 400
+    if not registry.model_exists(model_name):
+        return jsonify({"error": f"Model '{model_name}' not found"}), 404
+    if "file" not in request.files:
+        return jsonify({"error": "No file part"}), 400
 
-        save_heartbeat_predictions(data, predicted_labels, predictions_proba, model_name)
-        
-        if y_true:
-            save_model_performance(model_name, accuracy, cm)
+    fmt = request.form.get("format", "csv")
+    if fmt not in SIGNAL_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(SIGNAL_FORMATS)}"}), 400
 
-        db.session.commit()
+    try:
+        sampling_rate = _form_number("sampling_rate", float)
+        channels = _form_number("channels", int, default=1)
+        patient_id = _form_number("patient_id", int)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if channels < 1:
+        return jsonify({"error": "channels must be at least 1"}), 400
 
-        return jsonify({"message": "Prediction successful"}), 200
+    try:
+        ecg, record_rate = read_signal(
+            request.files["file"].stream,
+            fmt,
+            channel=request.form.get("channel"),
+            dtype=request.form.get("dtype", "float32"),
+            channels=channels,
+            wfdb_header=request.files.get("header")
+        )
+    except (ValueError, KeyError, IndexError) as e:
+        return jsonify({"error": f"Could not read signal: {e}"}), 400
+
+    sampling_rate = record_rate or sampling_rate
+    if not sampling_rate:
+        return jsonify({"error": "sampling_rate is required"}), 400
+    if not np.isfinite(sampling_rate) or sampling_rate <= 0:
+        return jsonify({"error": "sampling_rate must be a positive number"}), 400
 
+    try:
+        result = run_signal_prediction(model_name, ecg, sampling_rate, patient_id=patient_id)
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+    predicted_types = [PREDICTION_LABELS.get(label, "Unknown") for label in result["predicted_labels"].tolist()]
+    class_counts = {}
+    for predicted_type in predicted_types:
+        class_counts[predicted_type] = class_counts.get(predicted_type, 0) + 1
+
+    return jsonify({
+        "model_name": model_name,
+        "duration_seconds": round(len(ecg) / sampling_rate, 3),
+        "beats": len(predicted_types),
+        "class_counts": class_counts,
+        "r_peak_seconds": np.round(result["peak_seconds"], 3).tolist(),
+        "predicted_types": predicted_types,
+        "confidences": np.round(result["confidences"], 4).tolist(),
+        "stored": result["stored"],
+        "segment_seconds": round(result["segment_seconds"], 3),
+        "classify_seconds": round(result["classify_seconds"], 3)
+    }), 200
+
 
 @bp.route("/models", methods=["GET"])
 def list_models():
@@ -172,10 +538,7 @@ responses:
     if not payload:
         return jsonify({"error": "Invalid or expired token"}), 401
 
-    files = os.listdir(MODEL_FOLDER)
-    model_names = [f[:-3] for f in files if f.endswith(".h5")]
-    print("Model folder path:", MODEL_FOLDER)
-    print("Files found:", os.listdir(MODEL_FOLDER))
+    model_names = registry.list_model_names()
     return jsonify({"models": model_names,}), 200
 
 @bp.route("/model-performance/<int:id>", methods=["GET"])
@@ -271,80 +634,12 @@ def validate_input():
         raise Exception("No selected file")
     if not allowed_file(file.filename, {"csv"}):
         raise Exception("Invalid file type; only CSV allowed")
-    model_path = os.path.join(MODEL_FOLDER, f"{model_name}.h5")
+    model_path = registry.model_path(model_name)
     if not os.path.exists(model_path):
         raise Exception(f"Model '{model_name}' not found")
     return model_name, file, model_path
 
 
-def save_uploaded_file(file):
-    filename = secure_filename(file.filename)
-    tmp_path = os.path.join("/tmp", filename)
-    file.save(tmp_path)
-    return tmp_path
-
-
-def load_model_and_data(model_path, csv_path):
-    model = tf.keras.models.load_model(model_path)
-    data = pd.read_csv(csv_path)
-    return model, data
-
-
-def prepare_features(data):
-    # Extract features (first 188 columns)
-    X = data.iloc[:, :187].values
-
-    # Use the last column as ground truth if available
-    if data.shape[1] > 187:
-        y_true = data.iloc[:, 187].tolist()
-    else:
-        y_true = None
-
-    return X, y_true
-
-
-def ensure_patient_exists(patient_id):
-    patient = Patient.query.get(patient_id)
-    if not patient:
-        patient = Patient(id=patient_id, name="tmp")
-        db.session.add(patient)
-        db.session.flush()
-    return patient
-
-
-def save_heartbeat_predictions(data, predicted_labels, predictions_proba, model_name):
-    try:
-        for idx, row in data.iterrows():
-            signal = row[:187].tolist()                      
-            label = str(int(row[187]))                       
-            patient_id = int(row[188])                       
-
-            ensure_patient_exists(patient_id)
-
-            heartbeat = Heartbeat(
-                patient_id=patient_id,
-                ecg_features=signal,
-                heartbeat_type=label,
-                predicted_type=PREDICTION_LABELS.get(predicted_labels[idx], "Unknown"),
-                prediction_confidence=float(np.max(predictions_proba[idx])),
-                model_name=model_name
-            )
-            db.session.add(heartbeat)  
-        db.session.commit()            
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": str(e)}), 500
-
-
-def save_model_performance(model_name, accuracy, cm):
-    performance = ModelPerformance(
-        model_name=model_name,
-        accuracy=accuracy,
-        confusion_matrix=cm
-    )
-    db.session.add(performance)
-
-
 @bpM.route('/retrain', methods=['POST'])
 def retrain():
     """
@@ -358,20 +653,41 @@ def retrain():
           type: string
           required: true
           description: Bearer JWT token (e.g., "Bearer <your_token>")
+        - name: body
+          in: body
+          required: false
+          schema:
+            type: object
+            properties:
+              mode:
+                type: string
+                enum: [full, incremental]
+                default: full
+                description: >
+                  incremental fine-tunes the latest trained model on heartbeats
+                  labeled since it was trained
+              replay_fraction:
+                type: number
+                default: 0
+                example: 0.1
+                description: Share of older heartbeats replayed in incremental mode (0-1)
       responses:
-        200:
-          description: Retraining completed successfully
+        202:
+          description: Retraining started in a background process
           schema:
             type: object
             properties:
               message:
                 type: string
-                example: Retraining completed
-              model_version:
+                example: Retraining started
+              job_id:
+                type: integer
+                example: 3
+              status:
                 type: string
-                example: "1.4"
+                example: queued
         400:
-          description: Token is missing user ID
+          description: Token is missing user ID or invalid training options
           schema:
             type: object
             properties:
@@ -386,8 +702,10 @@ def retrain():
               error:
                 type: string
                 example: Invalid or missing token
+        409:
+          description: Another retraining job is still running
         500:
-          description: Error during retraining (e.g., no valid heartbeats)
+          description: Error while starting the retraining job
           schema:
             type: object
             properties:
@@ -405,15 +723,137 @@ def retrain():
     if user_id is None:
         return jsonify({"error": "Token missing user_id"}), 400
 
-    app = current_app._get_current_object()
+    options = request.get_json(silent=True) or {}
+    if not isinstance(options, dict):
+        return jsonify({"error": "JSON object expected"}), 400
+    mode = options.get("mode", "full")
+    if mode not in TRAINING_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(TRAINING_MODES)}"}), 400
+    try:
+        replay_fraction = float(options.get("replay_fraction", 0.0))
+    except (TypeError, ValueError):
+        replay_fraction = -1
+    if not 0 <= replay_fraction <= 1:
+        return jsonify({"error": "replay_fraction must be a number between 0 and 1"}), 400
 
     try:
-        version = run_retraining(app, user_id)
-        return jsonify({
-            "message": "Retraining completed",
-            "model_version": version
-        }), 200
+        job = start_training_job(user_id, mode=mode, replay_fraction=replay_fraction)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         import traceback
         traceback.print_exc()
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "message": "Retraining started",
+        "job_id": job.id,
+        "status": job.status
+    }), 202
+
+
+@bpM.route('/retrain/<int:job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """
+      Get progress of a retraining job
+      ---
+      tags:
+        - Model
+      parameters:
+        - name: Authorization
+          in: header
+          type: string
+          required: true
+          description: Bearer JWT token (e.g., "Bearer <your_token>")
+        - name: job_id
+          in: path
+          type: integer
+          required: true
+      responses:
+        200:
+          description: Training job status with current epoch, batch and metrics
+          schema:
+            type: object
+            properties:
+              id:
+                type: integer
+              status:
+                type: string
+                enum: [queued, running, completed, failed, cancelled]
+              epoch:
+                type: integer
+              total_epochs:
+                type: integer
+              batch:
+                type: integer
+              total_batches:
+                type: integer
+              loss:
+                type: number
+              accuracy:
+                type: number
+              val_loss:
+                type: number
+              val_accuracy:
+                type: number
+              model_version:
+                type: string
+                example: "1.4"
+              error:
+                type: string
+        401:
+          description: Invalid or missing JWT token
+        404:
+          description: Training job not found
+    """
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if not verify_token(token):
+        return jsonify({"error": "Invalid or missing token"}), 401
+
+    job = db.session.get(TrainingJob, job_id)
+    if not job:
+        return jsonify({"error": "Training job not found"}), 404
+
+    return jsonify(job.to_dict()), 200
+
+
+@bpM.route('/retrain/<int:job_id>/cancel', methods=['POST'])
+def cancel_training(job_id):
+    """
+      Cancel a queued or running retraining job
+      ---
+      tags:
+        - Model
+      parameters:
+        - name: Authorization
+          in: header
+          type: string
+          required: true
+          description: Bearer JWT token (e.g., "Bearer <your_token>")
+        - name: job_id
+          in: path
+          type: integer
+          required: true
+      responses:
+        202:
+          description: Cancellation requested; the job stops at its next progress update
+        401:
+          description: Invalid or missing JWT token
+        404:
+          description: Training job not found
+        409:
+          description: Job has already finished
+    """
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if not verify_token(token):
+        return jsonify({"error": "Invalid or missing token"}), 401
+
+    job = db.session.get(TrainingJob, job_id)
+    if not job:
+        return jsonify({"error": "Training job not found"}), 404
+    if job.status not in ACTIVE_STATUSES:
+        return jsonify({"error": f"Training job already {job.status}"}), 409
+
+    job = cancel_training_job(job)
+    return jsonify(job.to_dict()), 202
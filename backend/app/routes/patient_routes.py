@@ -1,18 +1,43 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.extensions import db
 from app.models.patient import Patient
 from datetime import datetime
 from app.models.heartbeat import Heartbeat
-from sqlalchemy import desc
+from app.models.patientsummary import PatientSummary
+from sqlalchemy import desc, func, and_, or_, select
 import traceback
 import io
 import csv
 from werkzeug.utils import secure_filename
-from collections import Counter
+import base64
+import json
+from app.utils.ecg import minmax_decimate
+from app.utils import export
 
 
 bp = Blueprint('patients', __name__, url_prefix='/patients')
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+ARRHYTHMIC_TYPES = ("3", "Arrhythmic")
+DEFAULT_HEARTBEAT_PAGE_SIZE = 500
+MAX_HEARTBEAT_PAGE_SIZE = 5000
+EXPORT_BATCH_SIZE = 2000
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'npy': 'application/octet-stream'
+}
+HEARTBEAT_FIELDS = (
+    'id', 'timestamp', 'ecg_features', 'heartbeat_type',
+    'predicted_type', 'prediction_confidence', 'model_name'
+)
+PATIENT_SORT_COLUMNS = {
+    'id': Patient.id,
+    'name': Patient.name,
+    'created_at': Patient.created_at
+}
+
 
 @bp.route('', methods=['POST'])
 def create_patient():
@@ -83,35 +108,127 @@ def create_patient():
 
 @bp.route('', methods=['GET'])
 def list_patients():
+    """
+        List patients with their most common prediction, one page at a time
+        ---
+        tags:
+          - Patients
+        parameters:
+          - name: limit
+            in: query
+            type: integer
+            default: 50
+            description: Page size (max 500)
+          - name: cursor
+            in: query
+            type: string
+            description: next_cursor from the previous page
+          - name: sort
+            in: query
+            type: string
+            enum: [id, name, created_at]
+            default: id
+          - name: order
+            in: query
+            type: string
+            enum: [asc, desc]
+            default: asc
+        responses:
+          200:
+            description: A page of patients
+            schema:
+              type: object
+              properties:
+                patients:
+                  type: array
+                  items:
+                    type: object
+                next_cursor:
+                  type: string
+                  description: Pass as cursor to get the next page; null on the last page
+          400:
+            description: Invalid pagination parameters
+    """
     try:
-        patients = Patient.query.all()
-        result = []
-        for p in patients:
-            heartbeats = Heartbeat.query.filter_by(patient_id=p.id).all()
-            prediction_types = [hb.predicted_type for hb in heartbeats if hb.predicted_type]
-
-            if prediction_types:
-                most_common_prediction = Counter(prediction_types).most_common(1)[0][0]
-            else:
-                most_common_prediction = None
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        sort = request.args.get('sort', 'id')
+        order = request.args.get('order', 'asc')
+        if limit < 1 or sort not in PATIENT_SORT_COLUMNS or order not in ('asc', 'desc'):
+            raise ValueError("Invalid pagination parameters")
+        after = decode_cursor(request.args.get('cursor'), sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-            result.append({
-                'id': p.id,
-                'name': p.name,
-                'gender': p.gender,
-                'birth_date': p.birth_date.strftime('%Y-%m-%d') if p.birth_date else None,
-                'contact_info': p.contact_info,
-                'created_at': p.created_at.isoformat(),
-                'last_prediction': most_common_prediction
-            })
-
-        return jsonify(result), 200
+    try:
+        sort_column = PATIENT_SORT_COLUMNS[sort]
+        query = Patient.query
+        if after is not None:
+            query = query.filter(keyset_filter(sort_column, after, order))
+        if order == 'desc':
+            query = query.order_by(sort_column.desc(), Patient.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Patient.id.asc())
+
+        # Fetch one extra row to know whether another page follows
+        patients = query.limit(limit + 1).all()
+        has_more = len(patients) > limit
+        patients = patients[:limit]
+
+        most_common = most_common_predictions([p.id for p in patients])
+
+        result = [{
+            'id': p.id,
+            'name': p.name,
+            'gender': p.gender,
+            'birth_date': p.birth_date.strftime('%Y-%m-%d') if p.birth_date else None,
+            'contact_info': p.contact_info,
+            'created_at': p.created_at.isoformat(),
+            'last_prediction': most_common.get(p.id)
+        } for p in patients]
+
+        next_cursor = encode_cursor(patients[-1], sort) if has_more else None
+        return jsonify({'patients': result, 'next_cursor': next_cursor}), 200
 
     except Exception as e:
         print(f"Error listing patients: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 
+def most_common_predictions(patient_ids):
+    if not patient_ids:
+        return {}
+
+    summaries = PatientSummary.query.filter(PatientSummary.patient_id.in_(patient_ids)).all()
+    return {s.patient_id: s.most_common_prediction for s in summaries}
+
+
+def encode_cursor(patient, sort):
+    value = getattr(patient, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, patient.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, sort):
+    if not cursor:
+        return None
+    try:
+        value, patient_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == 'created_at':
+            value = datetime.fromisoformat(value)
+        return value, int(patient_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(sort_column, after, order):
+    value, patient_id = after
+    if sort_column is Patient.id:
+        return Patient.id < patient_id if order == 'desc' else Patient.id > patient_id
+    if order == 'desc':
+        return or_(sort_column < value, and_(sort_column == value, Patient.id < patient_id))
+    return or_(sort_column > value, and_(sort_column == value, Patient.id > patient_id))
 
 
 @bp.route('/<int:patient_id>', methods=['GET'])
@@ -185,26 +302,28 @@ def get_patient_status(patient_id):
     if not patient:
         return jsonify({'error': 'Patient not found'}), 404
 
-    heartbeats = Heartbeat.query.filter_by(patient_id=patient_id).all()
-    if not heartbeats:
+    summary = db.session.get(PatientSummary, patient_id)
+    if not summary or not summary.total_heartbeats:
         return jsonify({'error': 'No heartbeat data for this patient'}), 404
 
-    abnormal_count = sum(1 for hb in heartbeats if hb.predicted_type == 'Arrhythmic')
-    total = len(heartbeats)
+    abnormal_count = summary.class_counts.get('Arrhythmic', 0)
     status = 'Arrhythmic' if abnormal_count > 0 else 'Normal'
 
     return jsonify({
         'patient_id': patient.id,
         'status': status,
-        'total_heartbeats': total,
-        'abnormal_heartbeats': abnormal_count
+        'total_heartbeats': summary.total_heartbeats,
+        'abnormal_heartbeats': abnormal_count,
+        'class_counts': summary.class_counts,
+        'mean_confidence': summary.mean_confidence,
+        'last_prediction_at': summary.last_prediction_at.isoformat() if summary.last_prediction_at else None
     }), 200
 
 
 @bp.route('/<int:patient_id>/heartbeats', methods=['GET'])
 def get_patient_heartbeats(patient_id):
     """
-        Get all heartbeats for a patient
+        Get a page of heartbeats for a patient
         ---
         tags:
           - Heartbeats
@@ -213,30 +332,145 @@ def get_patient_heartbeats(patient_id):
             in: path
             type: integer
             required: true
+          - name: after_id
+            in: query
+            type: integer
+            description: Return heartbeats with a larger id (next_after_id of the previous page)
+          - name: limit
+            in: query
+            type: integer
+            default: 500
+            description: Page size (max 5000)
+          - name: fields
+            in: query
+            type: string
+            description: >
+              Comma-separated fields to return, e.g. "id,timestamp,predicted_type".
+              Leave out ecg_features for list views. Defaults to all fields.
+          - name: points
+            in: query
+            type: integer
+            description: Min/max-decimate each ECG array to about this many samples
         responses:
           200:
-            description: List of heartbeats with features and prediction
+            description: Heartbeats ordered by id
+            schema:
+              type: object
+              properties:
+                heartbeats:
+                  type: array
+                  items:
+                    type: object
+                next_after_id:
+                  type: integer
+                  description: Pass as after_id to get the next page; null on the last page
+          400:
+            description: Invalid query parameters
           404:
             description: Patient not found
     """
-    patient = Patient.query.get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
       return jsonify({'error': 'Patient not found'}), 404
 
-    heartbeats = Heartbeat.query.filter_by(patient_id=patient_id).all()
+    try:
+        after_id = int(request.args.get('after_id', 0))
+        limit = min(int(request.args.get('limit', DEFAULT_HEARTBEAT_PAGE_SIZE)), MAX_HEARTBEAT_PAGE_SIZE)
+        fields = parse_heartbeat_fields(request.args.get('fields'))
+        points = parse_points(request.args.get('points'))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Only the requested columns are selected, so list views never load ECG blobs
+    rows = (
+        db.session.query(*[getattr(Heartbeat, f) for f in fields])
+        .filter(Heartbeat.patient_id == patient_id, Heartbeat.id > after_id)
+        .order_by(Heartbeat.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return jsonify({
+        'heartbeats': [serialize_heartbeat(row, points) for row in rows],
+        'next_after_id': rows[-1].id if has_more else None
+    }), 200
+
+@bp.route('/<int:patient_id>/heartbeats/export', methods=['GET'])
+def export_patient_heartbeats(patient_id):
+    """
+        Stream every heartbeat of a patient as NDJSON, CSV or NumPy .npy
+        ---
+        tags:
+          - Heartbeats
+        parameters:
+          - name: patient_id
+            in: path
+            type: integer
+            required: true
+          - name: format
+            in: query
+            type: string
+            enum: [ndjson, csv, npy]
+            default: ndjson
+            description: >
+              csv and npy use the /model/predict layout: 187 samples, label, record.
+              npy is a float32 array of shape (N, 189).
+        produces:
+          - application/x-ndjson
+          - text/csv
+          - application/octet-stream
+        responses:
+          200:
+            description: Streamed export, ordered by heartbeat id
+          400:
+            description: Unknown format
+          404:
+            description: Patient not found
+    """
+    patient = db.session.get(Patient, patient_id)
+    if not patient:
+        return jsonify({'error': 'Patient not found'}), 404
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_MIMETYPES)}"}), 400
+
+    # Pin the id range so the row count (needed up front for .npy) stays exact
+    max_id = db.session.query(func.max(Heartbeat.id)).filter(Heartbeat.patient_id == patient_id).scalar() or 0
+    criteria = (Heartbeat.patient_id == patient_id, Heartbeat.id <= max_id)
+
+    def generate():
+        if export_format == 'csv':
+            yield export.CSV_HEADER
+        elif export_format == 'npy':
+            count = db.session.query(func.count(Heartbeat.id)).filter(*criteria).scalar()
+            yield export.npy_header(count)
+
+        stmt = (
+            select(*[getattr(Heartbeat, f) for f in export.NDJSON_FIELDS])
+            .where(*criteria)
+            .order_by(Heartbeat.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in db.session.execute(stmt).partitions():
+            if export_format == 'csv':
+                yield export.csv_chunk(rows, patient_id)
+            elif export_format == 'npy':
+                yield export.npy_chunk(rows, patient_id)
+            else:
+                yield export.ndjson_chunk(rows)
 
-    data = []
-    for hb in heartbeats:
-        data.append({
-            'id': hb.id,
-            'timestamp': hb.timestamp.isoformat(),
-            'ecg_features': hb.ecg_features,  # Full ECG array
-            'heartbeat_type': hb.heartbeat_type,
-            'predicted_type': hb.predicted_type,
-            'prediction_confidence': hb.prediction_confidence
-        })
+    filename = f"patient_{patient_id}_heartbeats.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
-    return jsonify(data), 200
 
 @bp.route('/<int:patient_id>/heartbeats/<int:heartbeat_id>', methods=['GET'])
 def get_heartbeat_by_id(patient_id, heartbeat_id):
@@ -254,31 +488,73 @@ def get_heartbeat_by_id(patient_id, heartbeat_id):
             in: path
             type: integer
             required: true
+          - name: points
+            in: query
+            type: integer
+            description: Min/max-decimate the ECG array to about this many samples
         responses:
           200:
             description: Specific heartbeat data
+          400:
+            description: Invalid query parameters
           404:
             description: Patient or heartbeat not found
     """
 
-  patient = Patient.query.get(patient_id)
+  patient = db.session.get(Patient, patient_id)
   if not patient:
     return jsonify({'error': 'Patient not found'}), 404
 
+  try:
+    points = parse_points(request.args.get('points'))
+  except ValueError as e:
+    return jsonify({'error': str(e)}), 400
+
   heartbeat = Heartbeat.query.filter_by(id=heartbeat_id, patient_id=patient_id).first()
   if not heartbeat:
     return jsonify({'error': 'Heartbeat not found for this patient'}), 404
 
-  data = {
-    'id': heartbeat.id,
-    'timestamp': heartbeat.timestamp.isoformat(),
-    'ecg_features': heartbeat.ecg_features,  # entire ECG voltage array
-    'heartbeat_type': heartbeat.heartbeat_type,
-    'predicted_type': heartbeat.predicted_type,
-    'prediction_confidence': heartbeat.prediction_confidence
-  }
+  return jsonify(serialize_heartbeat(heartbeat, points)), 200
+
+
+def parse_heartbeat_fields(raw):
+    if not raw:
+        return list(HEARTBEAT_FIELDS)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = set(fields) - set(HEARTBEAT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    # id is always returned since it is the pagination key
+    return ['id'] + [f for f in fields if f != 'id']
+
+
+def parse_points(raw):
+    if raw is None:
+        return None
+    points = int(raw)
+    if points < 2:
+        raise ValueError("points must be at least 2")
+    return points
+
+
+def serialize_heartbeat(row, points=None):
+    # Accepts both projected rows and full Heartbeat objects
+    available = row._fields if hasattr(row, '_fields') else HEARTBEAT_FIELDS
+    data = {}
+    for field in HEARTBEAT_FIELDS:
+        if field not in available:
+            continue
+        value = getattr(row, field)
+        if field == 'timestamp':
+            value = value.isoformat() if value else None
+        elif field == 'ecg_features' and value is not None:
+            if points:
+                value, indices = minmax_decimate(value, points)
+                data['ecg_indices'] = indices.tolist()
+            value = value.tolist()
+        data[field] = value
+    return data
 
-  return jsonify(data), 200
 
 @bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
@@ -286,13 +562,15 @@ def get_dashboard_stats():
     Get dashboard statistics: total patients, classified arrhythmias, total arrhythmias
     """
     try:
-        total_patients = Patient.query.count()
-        total_arrhythmias = Heartbeat.query.count()
-
-      
-        classified_arrhythmias = Heartbeat.query.filter(
-            Heartbeat.predicted_type.in_(["3", "Arrhythmic"])
-        ).count()
+        total_patients = db.session.query(func.count(Patient.id)).scalar()
+        total_arrhythmias = db.session.query(
+            func.coalesce(func.sum(PatientSummary.total_heartbeats), 0)
+        ).scalar()
+
+        # Counted on the ix_heartbeat_predicted_type index, without loading any rows
+        classified_arrhythmias = db.session.query(func.count(Heartbeat.id)).filter(
+            Heartbeat.predicted_type.in_(ARRHYTHMIC_TYPES)
+        ).scalar()
 
         return jsonify({
             'total_patients': total_patients,
@@ -0,0 +1,47 @@
+"""Create any index declared on the models that is missing from the database.
+
+db.create_all() only creates indexes together with new tables, so existing
+deployments need this once after upgrading. An index whose columns changed
+since it was created is dropped and rebuilt:
+
+    python -m app.utils.create_indexes
+"""
+import os
+
+from sqlalchemy import inspect
+
+from app.extensions import db
+
+
+def create_missing_indexes(engine=None):
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix["name"]: ix["column_names"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            columns = [column.name for column in index.columns]
+            if existing.get(index.name) == columns:
+                continue
+            if index.name in existing:
+                print(f"Rebuilding index {index.name} on {table.name} as ({', '.join(columns)})...")
+                index.drop(bind=engine)
+            else:
+                print(f"Creating index {index.name} on {table.name}...")
+            index.create(bind=engine)
+            created.append(index.name)
+    return created
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        created = create_missing_indexes()
+        print(f"Created {len(created)} indexes.")
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def minmax_decimate(signal, points):
+    """Reduce ``signal`` to about ``points`` samples, keeping each bucket's min and max.
+
+    Returns ``(values, indices)`` where ``indices`` are the positions of the
+    kept samples in the original signal, so plots keep their time axis.
+    Peaks such as the R wave survive, unlike with plain striding.
+    """
+    signal = np.asarray(signal)
+    n = len(signal)
+    if points < 2 or n <= points:
+        return signal, np.arange(n)
+
+    buckets = points // 2
+    size = -(-n // buckets)  # ceil division
+    padded = np.full(buckets * size, np.nan, dtype=np.float64)
+    padded[:n] = signal
+    windows = padded.reshape(buckets, size)
+
+    # Drop trailing buckets that are pure padding
+    windows = windows[~np.all(np.isnan(windows), axis=1)]
+    offsets = np.arange(len(windows))[:, None] * size
+    positions = np.stack([np.nanargmin(windows, axis=1), np.nanargmax(windows, axis=1)], axis=1) + offsets
+    positions = np.sort(positions, axis=1).ravel()
+
+    # A flat bucket yields the same position twice
+    indices = positions[np.concatenate(([True], np.diff(positions) > 0))]
+    return signal[indices], indices
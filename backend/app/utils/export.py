@@ -0,0 +1,73 @@
+import io
+import json
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+FEATURE_LENGTH = 187
+CSV_HEADER = ",".join([str(i) for i in range(FEATURE_LENGTH)] + ["label", "record"]) + "\n"
+NDJSON_FIELDS = (
+    'id', 'timestamp', 'ecg_features', 'heartbeat_type',
+    'predicted_type', 'prediction_confidence', 'model_name'
+)
+
+
+def beat_matrix(rows, patient_id):
+    """Pack rows into float32 ``(k, 189)``: 187 samples, label, record.
+
+    This is the column layout /model/predict accepts. Short or missing
+    signals are padded with NaN; unparseable labels become NaN.
+    """
+    matrix = np.full((len(rows), FEATURE_LENGTH + 2), np.nan, dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row.ecg_features is not None:
+            signal = row.ecg_features[:FEATURE_LENGTH]
+            matrix[i, :len(signal)] = signal
+        matrix[i, FEATURE_LENGTH] = _label_value(row.heartbeat_type)
+    matrix[:, FEATURE_LENGTH + 1] = patient_id
+    return matrix
+
+
+def _label_value(label):
+    try:
+        return float(label)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def csv_chunk(rows, patient_id):
+    buffer = io.StringIO()
+    matrix = beat_matrix(rows, patient_id)
+    fmt = ["%.8g"] * FEATURE_LENGTH + ["%.0f", "%.0f"]
+    np.savetxt(buffer, matrix, fmt=fmt, delimiter=",")
+    return buffer.getvalue()
+
+
+def ndjson_chunk(rows):
+    lines = []
+    for row in rows:
+        record = {}
+        for field in NDJSON_FIELDS:
+            value = getattr(row, field)
+            if field == 'timestamp':
+                value = value.isoformat() if value else None
+            elif field == 'ecg_features' and value is not None:
+                value = value.tolist()
+            record[field] = value
+        lines.append(json.dumps(record))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def npy_header(row_count):
+    buffer = io.BytesIO()
+    header = {
+        'descr': npy_format.dtype_to_descr(np.dtype('<f4')),
+        'fortran_order': False,
+        'shape': (row_count, FEATURE_LENGTH + 2)
+    }
+    npy_format.write_array_header_1_0(buffer, header)
+    return buffer.getvalue()
+
+
+def npy_chunk(rows, patient_id):
+    return beat_matrix(rows, patient_id).astype('<f4', copy=False).tobytes()
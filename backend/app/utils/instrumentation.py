@@ -0,0 +1,275 @@
+"""Request timing, SQL accounting, Prometheus metrics and opt-in profiling.
+
+``span(name)`` times a block of code. Every span feeds the process-wide
+``arrhythmia_span_seconds`` histogram and, when a recorder is active on the
+current thread (every request, and every prediction job), its per-run
+totals. Requests report their spans and SQL usage back in the
+``Server-Timing``, ``X-SQL-Queries`` and ``X-SQL-Time-ms`` headers.
+
+/metrics, /health/db-pool and profiling are operator-only: the client must
+connect from METRICS_ALLOWED_NETWORKS (loopback by default) or, when
+METRICS_TOKEN is set, send it as ``Authorization: Bearer <token>``.
+
+With the PROFILING_ENABLED config flag on (env PROFILING_ENABLED=1), an
+operator request carrying ``X-Profile: cprofile`` (or ``pyinstrument``, if
+installed) is profiled and the dump is written to PROFILE_DIR. Only its id
+comes back, in ``X-Profile-Id``; fetch it from /health/profiles/<id>.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all workers.
+"""
+import cProfile
+import hmac
+import ipaddress
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/arrhythmia_profiles")
+PROFILERS = ("cprofile", "pyinstrument")
+PROFILE_EXTENSIONS = {"cprofile": ".prof", "pyinstrument": ".html"}
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_NETWORKS = tuple(
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128").split(",") if network.strip()
+)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+REQUEST_SECONDS = Histogram(
+    "arrhythmia_http_request_seconds", "HTTP request latency",
+    ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS
+)
+SPAN_SECONDS = Histogram(
+    "arrhythmia_span_seconds", "Time spent in instrumented code spans",
+    ["span"], buckets=LATENCY_BUCKETS
+)
+SQL_QUERY_SECONDS = Histogram(
+    "arrhythmia_sql_query_seconds", "Duration of individual SQL statements", buckets=SQL_BUCKETS
+)
+SQL_QUERIES_PER_REQUEST = Histogram(
+    "arrhythmia_sql_queries_per_request", "SQL statements issued per HTTP request",
+    ["endpoint"], buckets=QUERY_COUNT_BUCKETS
+)
+SQL_ERRORS = Counter("arrhythmia_sql_errors", "SQL statements that raised")
+
+_local = threading.local()
+
+
+class SpanRecorder:
+    """Per-thread totals for the spans and SQL statements of one request or job."""
+
+    def __init__(self):
+        self.span_seconds = defaultdict(float)
+        self.span_counts = defaultdict(int)
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+    def add_span(self, name, seconds):
+        self.span_seconds[name] += seconds
+        self.span_counts[name] += 1
+
+    def add_query(self, seconds):
+        self.sql_queries += 1
+        self.sql_seconds += seconds
+
+    def as_dict(self):
+        spans = {
+            name: {"seconds": round(seconds, 4), "count": self.span_counts[name]}
+            for name, seconds in self.span_seconds.items()
+        }
+        return {"spans": spans, "sql_queries": self.sql_queries, "sql_seconds": round(self.sql_seconds, 4)}
+
+    def server_timing(self):
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.span_seconds.items()]
+        entries.append(f"sql;dur={self.sql_seconds * 1000:.1f};desc=\"{self.sql_queries} queries\"")
+        return ", ".join(entries)
+
+
+def current_recorder():
+    return getattr(_local, "recorder", None)
+
+
+@contextmanager
+def recording():
+    """Collect the spans and SQL statements of the enclosed block on this thread."""
+    previous = current_recorder()
+    recorder = _local.recorder = SpanRecorder()
+    try:
+        yield recorder
+    finally:
+        _local.recorder = previous
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.labels(name).observe(elapsed)
+        recorder = current_recorder()
+        if recorder is not None:
+            recorder.add_span(name, elapsed)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    SQL_QUERY_SECONDS.observe(elapsed)
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.add_query(elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    SQL_ERRORS.inc()
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def operator_request():
+    """True if the current request may see metrics, pool state and profiles."""
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return False
+    return any(address in network for network in METRICS_ALLOWED_NETWORKS)
+
+
+def operator_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not operator_request():
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def metrics_response():
+    """Return ``(body, content_type)`` in the Prometheus text format."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Each gunicorn worker writes its own files; merge them on every scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _start_profiler(kind):
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return None
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(kind, profiler):
+    if kind == "pyinstrument":
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _dump_profile(kind, profiler):
+    """Write the profile to PROFILE_DIR and return its id; clients never see server paths."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    path = os.path.join(PROFILE_DIR, profile_id + PROFILE_EXTENSIONS[kind])
+    _stop_profiler(kind, profiler)
+    if kind == "pyinstrument":
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    else:
+        # Open with `python -m pstats` or snakeviz
+        profiler.dump_stats(path)
+    return profile_id
+
+
+def profile_path(profile_id):
+    """Path of a dumped profile, or None if ``profile_id`` is not one of ours."""
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    for extension in PROFILE_EXTENSIONS.values():
+        path = os.path.join(PROFILE_DIR, profile_id + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    _local.previous_recorder = current_recorder()
+    _local.recorder = g.span_recorder = SpanRecorder()
+
+    kind = request.headers.get("X-Profile", "").strip().lower()
+    if kind in PROFILERS and current_app.config["PROFILING_ENABLED"] and operator_request():
+        profiler = _start_profiler(kind)
+        if profiler is not None:
+            g.profiler = (kind, profiler)
+
+
+def _after_request(response):
+    recorder = g.get("span_recorder")
+    if recorder is None:
+        return response
+
+    if "profiler" in g:
+        kind, profiler = g.pop("profiler")
+        response.headers["X-Profile-Id"] = _dump_profile(kind, profiler)
+
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.labels(request.method, endpoint, response.status_code).observe(
+        time.perf_counter() - g.request_started
+    )
+    SQL_QUERIES_PER_REQUEST.labels(endpoint).observe(recorder.sql_queries)
+
+    response.headers["Server-Timing"] = recorder.server_timing()
+    response.headers["X-SQL-Queries"] = str(recorder.sql_queries)
+    response.headers["X-SQL-Time-ms"] = f"{recorder.sql_seconds * 1000:.1f}"
+    return response
+
+
+def _teardown_request(exc):
+    if "profiler" in g:
+        # The view raised before after_request could stop it
+        _stop_profiler(*g.pop("profiler"))
+    _local.recorder = getattr(_local, "previous_recorder", None)
+
+
+def init_app(app):
+    app.config.setdefault("PROFILING_ENABLED", PROFILING_ENABLED)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
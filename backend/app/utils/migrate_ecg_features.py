@@ -0,0 +1,94 @@
+"""Convert Heartbeat.ecg_features from JSON text to packed float32 bytes.
+
+`flask db upgrade` runs this conversion; the script does the same outside
+Alembic, one committed batch at a time:
+
+    python -m app.utils.migrate_ecg_features [--batch-size 5000]
+
+Rows are converted in id order into a temporary column, which then
+replaces the JSON column. Re-running after an interruption resumes
+where the previous run stopped.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+from sqlalchemy import inspect, text, JSON, LargeBinary, String
+
+from app.extensions import db
+from app.models.types import FLOAT32
+
+TABLE = "heartbeat"
+COLUMN = "ecg_features"
+TMP_COLUMN = "ecg_features_f32"
+
+
+def _columns(bind=None):
+    return {c["name"]: c["type"] for c in inspect(bind or db.engine).get_columns(TABLE)}
+
+
+def is_converted(columns):
+    # Reflected binary types vary by dialect (BLOB, LONGBLOB, BYTEA); the JSON column is JSON or text
+    return TMP_COLUMN not in columns and not isinstance(columns[COLUMN], (JSON, String))
+
+
+def convert_batch(conn, last_id, batch_size):
+    """Fill TMP_COLUMN for the next ``batch_size`` rows after ``last_id``; returns ``(count, last_id)``."""
+    rows = conn.execute(text(
+        f"SELECT id, {COLUMN} FROM {TABLE} "
+        f"WHERE id > :last_id AND {TMP_COLUMN} IS NULL AND {COLUMN} IS NOT NULL "
+        f"ORDER BY id LIMIT :limit"
+    ), {"last_id": last_id, "limit": batch_size}).all()
+    if not rows:
+        return 0, last_id
+
+    params = []
+    for row_id, raw in rows:
+        values = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        params.append({"id": row_id, "blob": np.asarray(values, dtype=FLOAT32).tobytes()})
+    conn.execute(text(f"UPDATE {TABLE} SET {TMP_COLUMN} = :blob WHERE id = :id"), params)
+    return len(rows), rows[-1][0]
+
+
+def migrate(batch_size=5000):
+    columns = _columns()
+    if COLUMN in columns and is_converted(columns):
+        print("ecg_features is already binary, nothing to do.")
+        return 0
+
+    binary_type = LargeBinary().compile(dialect=db.engine.dialect)
+
+    with db.engine.begin() as conn:
+        if TMP_COLUMN not in columns:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {TMP_COLUMN} {binary_type}"))
+
+    converted = 0
+    last_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            count, last_id = convert_batch(conn, last_id, batch_size)
+        if not count:
+            break
+        converted += count
+        print(f"Converted {converted} heartbeats (last id {last_id})")
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {TABLE} DROP COLUMN {COLUMN}"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME COLUMN {TMP_COLUMN} TO {COLUMN}"))
+
+    print(f"Migration finished: {converted} heartbeats converted.")
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        migrate(batch_size=args.batch_size)
@@ -0,0 +1,65 @@
+"""Add the training provenance columns to an existing trained_model table.
+
+db.create_all() does not add columns to tables that already exist, so run
+this once against a database created before incremental retraining:
+
+    python -m app.utils.migrate_trained_models
+
+Only missing columns are added, so re-running it is harmless. Versions
+trained before the upgrade keep NULL data windows; incremental retraining
+falls back to their creation time.
+"""
+import os
+
+from sqlalchemy import inspect, text, Float, Integer, String
+
+from app.extensions import db
+
+TABLE = "trained_model"
+FOREIGN_KEY = "fk_trained_model_base_model_id"
+
+# name -> (type, column options)
+COLUMNS = {
+    "training_mode": (String(20), "NOT NULL DEFAULT 'full'"),
+    "base_model_id": (Integer(), f"NULL REFERENCES {TABLE} (id)"),
+    "data_from_id": (Integer(), "NULL"),
+    "data_to_id": (Integer(), "NULL"),
+    "replay_fraction": (Float(), "NULL"),
+    "sample_count": (Integer(), "NULL"),
+}
+
+
+def migrate():
+    existing = {c["name"] for c in inspect(db.engine).get_columns(TABLE)}
+    missing = [name for name in COLUMNS if name not in existing]
+    if not missing:
+        print("trained_model already has the training columns, nothing to do.")
+        return []
+
+    dialect = db.engine.dialect
+    with db.engine.begin() as conn:
+        for name in missing:
+            column_type, options = COLUMNS[name]
+            if name == "base_model_id" and dialect.name != "sqlite":
+                # Inline REFERENCES is ignored by MySQL; SQLite cannot add constraints later
+                options = "NULL"
+            print(f"Adding {TABLE}.{name}...")
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {name} {column_type.compile(dialect=dialect)} {options}"))
+
+        if "base_model_id" in missing and dialect.name != "sqlite":
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ADD CONSTRAINT {FOREIGN_KEY} "
+                f"FOREIGN KEY (base_model_id) REFERENCES {TABLE} (id)"
+            ))
+
+    print(f"Migration finished: added {', '.join(missing)}.")
+    return missing
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        migrate()
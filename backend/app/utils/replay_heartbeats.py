@@ -0,0 +1,24 @@
+"""Store heartbeats the background writer dead-lettered while the database was failing.
+
+    python -m app.utils.replay_heartbeats [--directory /tmp/arrhythmia_dead_letters]
+
+Each file is deleted once its rows are committed, so re-running after an
+interruption only replays what is left.
+"""
+import argparse
+import os
+
+if __name__ == "__main__":
+    from app.ml.beat_writer import DEAD_LETTER_DIR
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", default=DEAD_LETTER_DIR)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    from app import create_app
+    from app.ml.beat_writer import replay_dead_letters
+
+    app = create_app()
+    with app.app_context():
+        print(f"Replayed {replay_dead_letters(args.directory)} heartbeats.")
@@ -0,0 +1,32 @@
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+from sqlalchemy import text
+
+from app.extensions import db
+
+_head_revisions = None
+
+
+def head_revisions():
+    global _head_revisions
+    if _head_revisions is None:
+        config = current_app.extensions['migrate'].migrate.get_config()
+        _head_revisions = set(ScriptDirectory.from_config(config).get_heads())
+    return _head_revisions
+
+
+def database_revisions():
+    with db.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        return set(MigrationContext.configure(conn).get_current_heads())
+
+
+def schema_status():
+    """Return ``(ready, details)``; ready means the database answers and is at the latest migration."""
+    current = database_revisions()
+    expected = head_revisions()
+    return current == expected, {
+        "database_revision": sorted(current),
+        "expected_revision": sorted(expected)
+    }
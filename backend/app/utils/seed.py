@@ -1,56 +1,241 @@
+"""Generate synthetic patients and heartbeats for development and load tests.
+
+Beats are synthesized with NumPy in the format of the MIT-BIH heartbeat
+dataset the models are trained on: 187 samples at 125 Hz starting at the
+R-peak, running for 1.2x the RR interval, scaled to [0, 1] and zero-padded.
+Each of the 5 classes has its own morphology and timing, with per-beat
+jitter, baseline wander and noise.
+
+    python -m app.utils.seed --patients 1000 --heartbeats 1000000
+    python -m app.utils.seed --heartbeats 100000 --csv upload.csv --no-db
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
 from faker import Faker
+from sqlalchemy import func, insert
+
 from app.extensions import db
-from app.models.patient import Patient
 from app.models.heartbeat import Heartbeat
-from datetime import datetime, timedelta
-import random
-from app import create_app
-
-fake = Faker()
-
-app = create_app()
-app.app_context().push()  # Needed for DB access in script
-
-def seed_patients(n=5):
-    for _ in range(n):
-        patient = Patient(
-            name=fake.name(),
-            gender=random.choice(['Male', 'Female', 'Other']),
-            birth_date=fake.date_of_birth(),
-            contact_info=fake.phone_number()
-        )
-        db.session.add(patient)
-        db.session.flush()  # Get patient.id before commit
-
-        # Add heartbeats
-        for _ in range(100):
-            heartbeat = Heartbeat(
-                patient_id=patient.id,
-                timestamp=datetime.utcnow() - timedelta(seconds=random.randint(0, 100000)),
-                pre_RR=random.uniform(200, 400),
-                post_RR=random.uniform(200, 400),
-                p_peak=random.uniform(-0.2, 0.2),
-                t_peak=random.uniform(-0.5, 0.5),
-                r_peak=random.uniform(0.5, 1.5),
-                s_peak=random.uniform(-0.5, 0.0),
-                q_peak=random.uniform(-0.1, 0.1),
-                qrs_interval=random.uniform(60, 120),
-                pq_interval=random.uniform(120, 200),
-                qt_interval=random.uniform(300, 450),
-                st_interval=random.uniform(80, 120),
-                qrs_morph0=random.uniform(-1, 1),
-                qrs_morph1=random.uniform(-1, 1),
-                qrs_morph2=random.uniform(-1, 1),
-                qrs_morph3=random.uniform(-1, 1),
-                qrs_morph4=random.uniform(-1, 1),
-                heartbeat_type=random.choice(['N', 'V', 'A']),
-                predicted_type=random.choice(['Normal', 'Arrhythmic']),
-                prediction_confidence=round(random.uniform(0.7, 1.0), 2)
+from app.models.patient import Patient
+from app.ml.prediction import PREDICTION_LABELS
+from app.utils.summaries import update_patient_summaries
+
+FEATURE_LENGTH = 187
+SAMPLING_RATE = 125
+NUM_CLASSES = 5
+CLASS_WEIGHTS = (0.83, 0.03, 0.07, 0.01, 0.06)  # Roughly the MIT-BIH training mix
+SEED_BATCH_SIZE = 10000
+CSV_CHUNK_ROWS = 50000
+SYNTHETIC_MODEL_NAME = "synthetic"
+
+_t = np.arange(FEATURE_LENGTH, dtype=np.float32) / SAMPLING_RATE  # Seconds after the R-peak
+
+# Per class: [rr, rr_jitter, qrs_width, s_depth, t_offset, t_width, t_height,
+#             next_rr_factor, p_height, pace_spike]
+# next_rr_factor places the following beat (premature beats are followed by a
+# compensatory pause); pace_spike adds a pacemaker artifact before the QRS.
+_CLASS_PARAMS = np.array([
+    [0.80, 0.08, 0.020, 0.20, 0.30, 0.060, 0.30, 1.00, 0.12, 0.0],   # 0 normal
+    [0.62, 0.06, 0.020, 0.20, 0.26, 0.055, 0.28, 1.25, -0.08, 0.0],  # 1 atrial premature
+    [0.65, 0.07, 0.060, 0.45, 0.36, 0.090, -0.45, 1.45, 0.00, 0.0],  # 2 premature ventricular
+    [0.78, 0.07, 0.040, 0.30, 0.33, 0.075, 0.10, 1.05, 0.08, 0.0],   # 3 fusion ventricular/normal
+    [0.85, 0.03, 0.055, 0.35, 0.34, 0.080, 0.22, 1.00, 0.00, 0.8],   # 4 paced / fusion of paced
+], dtype=np.float32)
+
+
+def _wave(center, width, height):
+    return height * np.exp(-np.square((_t[None, :] - center) / width))
+
+
+def _jitter(rng, n, scale):
+    return rng.normal(1.0, scale, (n, 1)).astype(np.float32)
+
+
+def generate_beats(n, rng, class_weights=CLASS_WEIGHTS, labels=None):
+    """Return ``(X, labels)`` with ``n`` synthetic float32 beats of 187 samples."""
+    if labels is None:
+        p = np.asarray(class_weights, dtype=np.float64)
+        labels = rng.choice(NUM_CLASSES, size=n, p=p / p.sum())
+    labels = np.asarray(labels, dtype=np.int64)
+    n = len(labels)
+
+    params = _CLASS_PARAMS[labels]
+    rr, rr_jitter, qrs_width, s_depth, t_offset, t_width, t_height, next_rr, p_height, pace_spike = (
+        params[:, [i]] for i in range(params.shape[1])
+    )
+
+    rr = np.clip(rr + rr_jitter * rng.standard_normal((n, 1)).astype(np.float32), 0.4, 1.4)
+    qrs_width = qrs_width * _jitter(rng, n, 0.1)
+    next_r = rr * next_rr
+
+    beat = (
+        _wave(0.0, qrs_width, _jitter(rng, n, 0.08))
+        + _wave(qrs_width * 1.8, qrs_width, -s_depth * _jitter(rng, n, 0.15))
+        + _wave(t_offset * _jitter(rng, n, 0.05), t_width, t_height * _jitter(rng, n, 0.15))
+        + _wave(next_r - 0.16, 0.035, p_height * _jitter(rng, n, 0.2))
+        + _wave(next_r, 0.02, _jitter(rng, n, 0.08))
+        + _wave(-0.04, 0.004, pace_spike)
+        + _wave(next_r - 0.04, 0.004, pace_spike)
+    )
+
+    # Baseline wander and measurement noise
+    phase = rng.uniform(0, 2 * np.pi, (n, 1)).astype(np.float32)
+    beat += 0.05 * rng.uniform(0, 1, (n, 1)).astype(np.float32) * np.sin(2 * np.pi * 0.3 * _t[None, :] + phase)
+    beat += rng.normal(0, 0.02, beat.shape).astype(np.float32)
+
+    # Each beat spans 1.2x its RR interval and is zero-padded after that
+    lengths = np.minimum(np.round(1.2 * rr[:, 0] * SAMPLING_RATE).astype(np.int64), FEATURE_LENGTH)
+    inside = np.arange(FEATURE_LENGTH)[None, :] < lengths[:, None]
+    low = np.where(inside, beat, np.inf).min(axis=1, keepdims=True)
+    high = np.where(inside, beat, -np.inf).max(axis=1, keepdims=True)
+    X = np.where(inside, (beat - low) / np.maximum(high - low, 1e-6), 0.0).astype(np.float32)
+    return X, labels
+
+
+def patient_weights(patients, skew=0.0):
+    """Share of beats per patient: uniform for skew 0, Zipf-like (a few heavy patients) above it."""
+    weights = 1.0 / np.power(np.arange(1, patients + 1, dtype=np.float64), skew)
+    return weights / weights.sum()
+
+
+def simulated_predictions(labels, rng, accuracy=0.9):
+    """Predicted classes and confidences that agree with ``labels`` about ``accuracy`` of the time."""
+    predicted = labels.copy()
+    wrong = rng.random(len(labels)) > accuracy
+    predicted[wrong] = rng.integers(0, NUM_CLASSES, int(wrong.sum()))
+    confidence = np.where(wrong, rng.uniform(0.35, 0.7, len(labels)), rng.uniform(0.7, 1.0, len(labels)))
+    return predicted, confidence
+
+
+def write_prediction_csv(path, rows, patient_ids, rng, class_weights=CLASS_WEIGHTS, skew=0.0,
+                         chunk_rows=CSV_CHUNK_ROWS):
+    """Write an upload for /model/predict: 187 samples, the label and the record (patient) id per row."""
+    patient_ids = np.asarray(patient_ids)
+    weights = patient_weights(len(patient_ids), skew)
+    # One %-format per row is several times faster than DataFrame.to_csv for wide float rows
+    row_format = ",".join(["%.5f"] * FEATURE_LENGTH) + ",%d,%d\n"
+    with open(path, "w") as f:
+        f.write(",".join(str(i) for i in range(FEATURE_LENGTH + 2)) + "\n")
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            X, labels = generate_beats(n, rng, class_weights)
+            owners = rng.choice(patient_ids, size=n, p=weights)
+            f.writelines(
+                row_format % (*signal, label, owner)
+                for signal, label, owner in zip(X.tolist(), labels.tolist(), owners.tolist())
             )
-            db.session.add(heartbeat)
 
+
+def seed_patients(count, rng):
+    fake = Faker()
+    fake.seed_instance(int(rng.integers(2 ** 31)))
+    first_id = (db.session.query(func.max(Patient.id)).scalar() or 0) + 1
+    genders = rng.choice(['Male', 'Female', 'Other'], size=count, p=[0.49, 0.49, 0.02])
+
+    ids = list(range(first_id, first_id + count))
+    for start in range(0, count, SEED_BATCH_SIZE):
+        db.session.execute(insert(Patient), [
+            {
+                "id": patient_id,
+                "name": fake.name(),
+                "gender": str(gender),
+                "birth_date": fake.date_of_birth(minimum_age=18, maximum_age=95),
+                "contact_info": fake.phone_number()
+            }
+            for patient_id, gender in zip(ids[start:start + SEED_BATCH_SIZE], genders[start:start + SEED_BATCH_SIZE])
+        ])
     db.session.commit()
-    print(f"Seeded {n} patients with heartbeat data.")
+    return ids
+
+
+def seed_heartbeats(patient_ids, total, rng, class_weights=CLASS_WEIGHTS, skew=0.0, labeled_fraction=1.0,
+                    model_name=SYNTHETIC_MODEL_NAME, batch_size=SEED_BATCH_SIZE):
+    """Bulk insert ``total`` beats spread over ``patient_ids`` and keep PatientSummary in step."""
+    patient_ids = np.asarray(patient_ids, dtype=np.int64)
+    weights = patient_weights(len(patient_ids), skew)
+    end_time = datetime.utcnow()
+    inserted = 0
+
+    while inserted < total:
+        n = min(batch_size, total - inserted)
+        X, labels = generate_beats(n, rng, class_weights)
+        owners = rng.choice(patient_ids, size=n, p=weights)
+        predicted, confidence = simulated_predictions(labels, rng)
+        labeled = rng.random(n) < labeled_fraction
+        # Spread beats over the last 30 days
+        offsets = rng.uniform(0, 30 * 24 * 3600, n)
+
+        predicted_types = [PREDICTION_LABELS[p] for p in predicted.tolist()]
+        confidences = confidence.tolist()
+        db.session.execute(insert(Heartbeat), [
+            {
+                "patient_id": owner,
+                "timestamp": end_time - timedelta(seconds=offset),
+                "ecg_features": signal,
+                "heartbeat_type": str(label) if is_labeled else None,
+                "predicted_type": predicted_type,
+                "prediction_confidence": conf,
+                "model_name": model_name
+            }
+            for owner, offset, signal, label, is_labeled, predicted_type, conf in zip(
+                owners.tolist(), offsets.tolist(), X, labels.tolist(), labeled.tolist(),
+                predicted_types, confidences
+            )
+        ])
+        update_patient_summaries(owners.tolist(), predicted_types, confidences, predicted_at=end_time)
+        db.session.commit()
+
+        inserted += n
+        print(f"Seeded {inserted}/{total} heartbeats")
+    return inserted
+
+
+def parse_weights(value):
+    weights = [float(w) for w in value.split(",")]
+    if len(weights) != NUM_CLASSES or any(w < 0 for w in weights) or not sum(weights):
+        raise argparse.ArgumentTypeError(f"expected {NUM_CLASSES} non-negative comma-separated weights")
+    return weights
+
 
 if __name__ == '__main__':
-    seed_patients(n=10)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--heartbeats", type=int, default=1000, help="total beats across all patients")
+    parser.add_argument("--class-weights", type=parse_weights, default=list(CLASS_WEIGHTS),
+                        help="relative frequency of classes 0-4, e.g. 0.83,0.03,0.07,0.01,0.06")
+    parser.add_argument("--patient-skew", type=float, default=0.0,
+                        help="0 spreads beats evenly; around 1 gives a few patients most of the beats")
+    parser.add_argument("--labeled-fraction", type=float, default=1.0)
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    parser.add_argument("--csv", help="also write a /model/predict upload with the same number of beats")
+    parser.add_argument("--no-db", action="store_true", help="only write the CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+
+    if args.no_db:
+        if not args.csv:
+            parser.error("--no-db needs --csv")
+        write_prediction_csv(args.csv, args.heartbeats, np.arange(1, args.patients + 1), rng,
+                             args.class_weights, args.patient_skew)
+        print(f"Wrote {args.heartbeats} beats to {args.csv} in {time.perf_counter() - started:.1f}s")
+    else:
+        os.environ.setdefault("MODEL_WARMUP", "0")
+        from app import create_app
+
+        app = create_app()
+        with app.app_context():
+            ids = seed_patients(args.patients, rng)
+            seed_heartbeats(ids, args.heartbeats, rng, args.class_weights, args.patient_skew,
+                            args.labeled_fraction, batch_size=args.batch_size)
+            if args.csv:
+                write_prediction_csv(args.csv, args.heartbeats, ids, rng, args.class_weights, args.patient_skew)
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {args.patients} patients and {args.heartbeats} heartbeats in {elapsed:.1f}s "
+              f"({args.heartbeats / elapsed:.0f} beats/s)")
@@ -0,0 +1,140 @@
+"""Maintain the PatientSummary rollup.
+
+Backfill or repair all summaries from the heartbeat table with:
+
+    python -m app.utils.summaries
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.heartbeat import Heartbeat
+from app.models.patientsummary import PatientSummary
+
+
+def update_patient_summaries(patient_ids, predicted_types, confidences, predicted_at=None):
+    """Fold a batch of newly inserted heartbeats into their patients' summaries.
+
+    Call inside the transaction that inserts the heartbeats so the rollup
+    commits (or rolls back) together with them.
+    """
+    predicted_at = predicted_at or datetime.utcnow()
+    deltas = defaultdict(lambda: {"total": 0, "classes": defaultdict(int), "conf_sum": 0.0, "conf_count": 0})
+    for patient_id, predicted_type, confidence in zip(patient_ids, predicted_types, confidences):
+        delta = deltas[patient_id]
+        delta["total"] += 1
+        if predicted_type is not None:
+            delta["classes"][predicted_type] += 1
+        if confidence is not None:
+            delta["conf_sum"] += confidence
+            delta["conf_count"] += 1
+
+    if not deltas:
+        return
+
+    # Create missing rows first, so two writers seeing a new patient at once
+    # cannot both insert it, then lock them all so neither loses counts
+    _insert_missing_summaries(list(deltas))
+    existing = {
+        s.patient_id: s for s in
+        PatientSummary.query.filter(PatientSummary.patient_id.in_(list(deltas))).with_for_update()
+    }
+    for patient_id, delta in deltas.items():
+        summary = existing[patient_id]
+        counts = dict(summary.class_counts or {})
+        for predicted_type, count in delta["classes"].items():
+            counts[predicted_type] = counts.get(predicted_type, 0) + count
+
+        summary.total_heartbeats += delta["total"]
+        summary.class_counts = counts
+        summary.confidence_sum += delta["conf_sum"]
+        summary.confidence_count += delta["conf_count"]
+        summary.last_prediction_at = predicted_at
+
+
+def _insert_missing_summaries(patient_ids):
+    """Insert empty summaries for these patients, skipping the ones that exist."""
+    rows = [
+        {"patient_id": patient_id, "total_heartbeats": 0, "class_counts": {},
+         "confidence_sum": 0.0, "confidence_count": 0}
+        for patient_id in patient_ids
+    ]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        stmt = module.insert(PatientSummary).on_conflict_do_nothing(index_elements=["patient_id"])
+    elif dialect == "mysql":
+        stmt = mysql.insert(PatientSummary)
+        stmt = stmt.on_duplicate_key_update(patient_id=stmt.inserted.patient_id)
+    else:
+        existing = {
+            patient_id for (patient_id,) in
+            db.session.query(PatientSummary.patient_id).filter(PatientSummary.patient_id.in_(patient_ids))
+        }
+        for row in rows:
+            if row["patient_id"] in existing:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(PatientSummary), [row])
+            except IntegrityError:
+                # Another writer created it first
+                pass
+        return
+    db.session.execute(stmt, rows)
+
+
+def rebuild_patient_summaries(session=None):
+    """Recompute every summary from the heartbeat table; ``session`` defaults to ``db.session``."""
+    session = session or db.session
+    rows = (
+        session.query(
+            Heartbeat.patient_id,
+            Heartbeat.predicted_type,
+            func.count(Heartbeat.id),
+            func.sum(Heartbeat.prediction_confidence),
+            func.count(Heartbeat.prediction_confidence),
+            func.max(Heartbeat.timestamp)
+        )
+        .group_by(Heartbeat.patient_id, Heartbeat.predicted_type)
+        .all()
+    )
+
+    summaries = {}
+    for patient_id, predicted_type, count, conf_sum, conf_count, last_at in rows:
+        summary = summaries.setdefault(patient_id, {
+            "patient_id": patient_id,
+            "total_heartbeats": 0,
+            "class_counts": {},
+            "confidence_sum": 0.0,
+            "confidence_count": 0,
+            "last_prediction_at": None
+        })
+        summary["total_heartbeats"] += count
+        if predicted_type is not None:
+            summary["class_counts"][predicted_type] = count
+        summary["confidence_sum"] += conf_sum or 0.0
+        summary["confidence_count"] += conf_count
+        if last_at and (summary["last_prediction_at"] is None or last_at > summary["last_prediction_at"]):
+            summary["last_prediction_at"] = last_at
+
+    session.query(PatientSummary).delete()
+    if summaries:
+        session.execute(insert(PatientSummary), list(summaries.values()))
+    session.commit()
+    return len(summaries)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        count = rebuild_patient_summaries()
+        print(f"Rebuilt summaries for {count} patients.")
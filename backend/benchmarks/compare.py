@@ -0,0 +1,42 @@
+"""Print the change between two benchmarks.run reports.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ("seconds", "rows_per_second", "p50_ms", "p95_ms", "p99_ms",
+           "queries", "queries_per_request", "peak_rss_mb")
+HIGHER_IS_BETTER = {"rows_per_second"}
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif key in METRICS and isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = dict(flatten(json.load(f)["scales"]))
+    with open(args.after) as f:
+        after = dict(flatten(json.load(f)["scales"]))
+
+    width = max(len(name) for name in after) if after else 0
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        change = (new - old) / old * 100 if old else 0.0
+        better = change > 0 if name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else change < 0
+        marker = "" if abs(change) < 5 else (" better" if better else " WORSE")
+        print(f"{name:<{width}}  {old:>12g}  {new:>12g}  {change:+7.1f}%{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Compare heartbeat/model_performance query plans without and with the declared indexes.
+
+Seeds a standalone database (a temporary SQLite file by default), runs the
+hot read queries with the model indexes dropped, creates them, and runs the
+same queries again. Prints EXPLAIN output and timings as JSON, and exits
+non-zero if a query does not use the index it was declared for:
+
+    python -m benchmarks.query_plans --rows 1000000
+    python -m benchmarks.query_plans --database-url mysql+pymysql://... --rows 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db  # noqa: E402
+from app.ml.dataset import labeled_heartbeats_filter  # noqa: E402
+from app.models.heartbeat import Heartbeat  # noqa: E402
+from app.models.modelperformance import ModelPerformance  # noqa: E402
+from app.models.patient import Patient  # noqa: E402
+from app.models.types import FLOAT32  # noqa: E402
+from app.ml.prediction import PREDICTION_LABELS  # noqa: E402
+from app.utils.seed import CLASS_WEIGHTS  # noqa: E402
+
+PREDICTED_TYPES = [PREDICTION_LABELS[label] for label in sorted(PREDICTION_LABELS)]
+MODEL_NAMES = ["model_cnn_lstm_v1_1", "model_cnn_lstm_v1_2", "model_cnn_lstm_v1_3"]
+INSERT_BATCH = 50000
+REPEATS = 5
+
+# Index each query's plan must use once the indexes exist. The labeled id window is
+# left out: walking the primary key from the window start is an equally good plan
+EXPECTED_INDEXES = {
+    "patient_heartbeat_page": "ix_heartbeat_patient_id_id",
+    "patient_latest_heartbeats": "ix_heartbeat_patient_id_timestamp",
+    "count_predicted_type": "ix_heartbeat_predicted_type",
+    "labeled_count": "ix_heartbeat_labeled",
+    "model_performance_history": "ix_model_performance_model_name_timestamp",
+    "model_performance_recent": "ix_model_performance_timestamp",
+}
+
+
+def seed(engine, rows, patients, performances, with_features, rng):
+    with engine.begin() as conn:
+        conn.execute(insert(Patient), [{"id": i, "name": f"patient {i}"} for i in range(1, patients + 1)])
+
+        start = datetime(2025, 1, 1)
+        for offset in range(0, rows, INSERT_BATCH):
+            n = min(INSERT_BATCH, rows - offset)
+            patient_ids = rng.integers(1, patients + 1, n)
+            classes = rng.choice(len(PREDICTED_TYPES), n, p=CLASS_WEIGHTS)
+            # Roughly a fifth of the rows come from unlabeled uploads
+            labeled = rng.random(n) >= 0.2
+            confidences = rng.uniform(0.5, 1.0, n)
+            signal = np.zeros(187, dtype=FLOAT32) if with_features else None
+
+            conn.execute(insert(Heartbeat), [
+                {
+                    "patient_id": int(patient_ids[i]),
+                    "timestamp": start + timedelta(seconds=offset + i),
+                    "ecg_features": signal,
+                    "heartbeat_type": str(int(classes[i])) if labeled[i] else None,
+                    "predicted_type": PREDICTED_TYPES[classes[i]],
+                    "prediction_confidence": float(confidences[i]),
+                    "model_name": MODEL_NAMES[0],
+                }
+                for i in range(n)
+            ])
+            print(f"Seeded {offset + n}/{rows} heartbeats", file=sys.stderr)
+
+        conn.execute(insert(ModelPerformance), [
+            {
+                "model_name": MODEL_NAMES[i % len(MODEL_NAMES)],
+                "accuracy": float(rng.uniform(0.8, 0.99)),
+                "confusion_matrix": None,
+                "timestamp": start + timedelta(minutes=i),
+            }
+            for i in range(performances)
+        ])
+
+
+def queries(patient_id, after_id, label_from_id, max_id):
+    return {
+        "patient_heartbeat_page": (
+            select(Heartbeat.id, Heartbeat.timestamp, Heartbeat.predicted_type)
+            .where(Heartbeat.patient_id == patient_id, Heartbeat.id > after_id)
+            .order_by(Heartbeat.id)
+            .limit(500)
+        ),
+        "patient_latest_heartbeats": (
+            select(Heartbeat.id, Heartbeat.timestamp)
+            .where(Heartbeat.patient_id == patient_id)
+            .order_by(Heartbeat.timestamp.desc())
+            .limit(50)
+        ),
+        "count_predicted_type": (
+            select(func.count()).select_from(Heartbeat)
+            .where(Heartbeat.predicted_type == "Premature ventricular contraction")
+        ),
+        "labeled_count": (
+            select(func.count(Heartbeat.id)).where(*labeled_heartbeats_filter(max_id))
+        ),
+        "labeled_window_ids": (
+            select(Heartbeat.id)
+            .where(Heartbeat.heartbeat_type.isnot(None), Heartbeat.id > label_from_id)
+            .order_by(Heartbeat.id)
+            .limit(10000)
+        ),
+        "model_performance_history": (
+            select(ModelPerformance.id, ModelPerformance.accuracy, ModelPerformance.timestamp)
+            .where(ModelPerformance.model_name == MODEL_NAMES[1])
+            .order_by(ModelPerformance.timestamp.desc())
+        ),
+        "model_performance_recent": (
+            select(ModelPerformance.id, ModelPerformance.model_name, ModelPerformance.timestamp)
+            .order_by(ModelPerformance.timestamp.desc())
+            .limit(50)
+        ),
+    }
+
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    return [" | ".join(str(v) for v in row) for row in conn.execute(text(prefix + sql))]
+
+
+def measure(engine, stmts):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in stmts.items():
+            timings = []
+            for _ in range(REPEATS):
+                started = time.perf_counter()
+                conn.execute(stmt).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                "plan": explain(conn, stmt),
+                "median_ms": round(float(np.median(timings)), 3),
+                "min_ms": round(min(timings), 3),
+            }
+    return results
+
+
+# Queries that must seek into their index rather than read all of it
+RANGE_SCANS = {"labeled_count"}
+
+
+def is_range_scan(dialect, plan):
+    if dialect == "sqlite":
+        return any("SEARCH" in line for line in plan)
+    if dialect == "postgresql":
+        return any("Index Cond" in line for line in plan)
+    # MySQL's access type column
+    return any(" | range | " in line or " | ref | " in line for line in plan)
+
+
+def index_check_failures(dialect, results):
+    failures = []
+    for name, index in EXPECTED_INDEXES.items():
+        plan = results[name]["plan"]
+        if not any(index in line for line in plan):
+            failures.append(f"{name} does not use {index}")
+        elif name in RANGE_SCANS and not is_range_scan(dialect, plan):
+            failures.append(f"{name} reads all of {index} instead of a range")
+    return failures
+
+
+def declared_indexes():
+    return [index for table in (Heartbeat.__table__, ModelPerformance.__table__) for index in table.indexes]
+
+
+def analyze(engine):
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+        elif engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE heartbeat"))
+            conn.execute(text("ANALYZE model_performance"))
+        else:
+            conn.execute(text("ANALYZE TABLE heartbeat, model_performance"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--performances", type=int, default=5000)
+    parser.add_argument("--with-features", action="store_true",
+                        help="store a 187-sample signal per row so the table has realistic width")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.database_url
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'query_plans.db')}"
+
+    engine = create_engine(url)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    for index in declared_indexes():
+        index.drop(bind=engine)
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    seed(engine, args.rows, args.patients, args.performances, args.with_features, rng)
+    seed_seconds = time.perf_counter() - started
+    analyze(engine)
+
+    # A busy patient in the middle of the table, and the last tenth of labeled rows
+    stmts = queries(patient_id=args.patients // 2, after_id=args.rows // 2, label_from_id=args.rows * 9 // 10,
+                    max_id=args.rows)
+
+    report = {
+        "dialect": engine.dialect.name,
+        "rows": args.rows,
+        "patients": args.patients,
+        "seed_seconds": round(seed_seconds, 1),
+        "without_indexes": measure(engine, stmts),
+    }
+
+    started = time.perf_counter()
+    for index in declared_indexes():
+        index.create(bind=engine)
+    analyze(engine)
+    report["index_build_seconds"] = round(time.perf_counter() - started, 1)
+    report["with_indexes"] = measure(engine, stmts)
+    report["index_check_failures"] = index_check_failures(engine.dialect.name, report["with_indexes"])
+
+    print(json.dumps(report, indent=2))
+
+    engine.dispose()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    if report["index_check_failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Benchmark the predict, persist, read and retrain hot paths at several data scales.
+
+Each scale starts from an empty, migrated database (a temporary SQLite file
+by default, or --database-url for a MySQL container), loads a synthetic
+upload through run_prediction() and then times the other paths against
+that data. Results are written as JSON so runs can be compared between
+commits with benchmarks/compare.py:
+
+    python -m benchmarks.run --scales 1000,100000 --output before.json
+    python -m benchmarks.run --scales 1000,100000,1000000 --database-url mysql+pymysql://... --output after.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.seed import generate_beats, write_prediction_csv  # noqa: E402
+
+DEFAULT_SCALES = "1000,100000"
+DEFAULT_MODEL = "best_model_cnn_lstm"
+RSS_SAMPLE_SECONDS = 0.01
+
+
+class QueryCounter:
+    """Counts statements and their time on an engine via cursor events."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        self.seconds = 0.0
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.seconds += time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+
+    def snapshot(self):
+        return self.count, self.seconds
+
+
+class PeakRSS:
+    """Samples resident memory in a thread; ru_maxrss only ever reports the process lifetime peak."""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            # Not Linux: fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(RSS_SAMPLE_SECONDS)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+@contextmanager
+def measured(counter, result):
+    queries_before, query_seconds_before = counter.snapshot()
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        yield
+        result["seconds"] = round(time.perf_counter() - started, 4)
+    queries, query_seconds = counter.snapshot()
+    result["queries"] = queries - queries_before
+    result["query_seconds"] = round(query_seconds - query_seconds_before, 4)
+    result["peak_rss_mb"] = round(rss.peak / 2 ** 20, 1)
+
+
+def latency_stats(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def timed_requests(client, counter, requests, **kwargs):
+    """Issue ``requests`` (a list of (method, url, body)) and return latency and query stats."""
+    samples = []
+    queries_before, _ = counter.snapshot()
+    with PeakRSS() as rss:
+        for method, url, body in requests:
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body, **kwargs)
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.get_data(as_text=True)}")
+    queries, _ = counter.snapshot()
+    stats = latency_stats(samples)
+    stats["queries_per_request"] = round((queries - queries_before) / len(requests), 2)
+    stats["peak_rss_mb"] = round(rss.peak / 2 ** 20, 1)
+    return stats
+
+
+def reset_schema(db):
+    from flask_migrate import upgrade
+    from sqlalchemy import text
+
+    db.drop_all()
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    upgrade()
+
+
+def bench_predict(app, counter, workdir, model_name, rows, patients, rng):
+    from app.ml.prediction import run_prediction
+
+    path = os.path.join(workdir, f"predict_{rows}.csv")
+    started = time.perf_counter()
+    write_prediction_csv(path, rows, np.arange(1, patients + 1), rng)
+    result = {"rows": rows, "csv_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+              "csv_generation_seconds": round(time.perf_counter() - started, 2)}
+
+    with app.app_context(), measured(counter, result):
+        with open(path, "rb") as stream:
+            run_prediction(model_name, stream)
+    result["rows_per_second"] = round(rows / result["seconds"], 1)
+    os.remove(path)
+    return result
+
+
+def bench_save(app, counter, model_name, rows, patients, rng):
+    import pandas as pd
+    from app.ml.prediction import save_heartbeat_predictions, HEARTBEAT_BATCH_SIZE
+
+    X, labels = generate_beats(rows, rng)
+    data = pd.DataFrame(X)
+    data[X.shape[1]] = labels
+    data[X.shape[1] + 1] = rng.integers(1, patients + 1, rows)
+    proba = rng.dirichlet(np.ones(5), rows).astype(np.float32)
+
+    result = {"rows": rows}
+    with app.app_context(), measured(counter, result):
+        for start in range(0, rows, 10000):
+            end = start + 10000
+            save_heartbeat_predictions(data.iloc[start:end], np.argmax(proba[start:end], axis=1),
+                                       proba[start:end], model_name, batch_size=HEARTBEAT_BATCH_SIZE)
+    result["rows_per_second"] = round(rows / result["seconds"], 1)
+    return result
+
+
+def bench_reads(client, counter, patients, repeats):
+    pages = [("GET", "/patients?limit=50", None)] * repeats
+    walk = []
+    response = client.get("/patients?limit=500").get_json()
+    while response.get("next_cursor"):
+        walk.append(("GET", f"/patients?limit=500&cursor={response['next_cursor']}", None))
+        response = client.get(walk[-1][1]).get_json()
+
+    patient_ids = np.linspace(1, patients, repeats, dtype=int).tolist()
+    return {
+        "list_patients_first_page": timed_requests(client, counter, pages),
+        "list_patients_walk": timed_requests(client, counter, walk) if walk else None,
+        "patient_status": timed_requests(client, counter, [("GET", f"/patients/{i}/status", None) for i in patient_ids]),
+        "patient_heartbeats_page": timed_requests(
+            client, counter, [("GET", f"/patients/{i}/heartbeats?limit=500", None) for i in patient_ids]
+        ),
+        "patient_heartbeats_timeline": timed_requests(
+            client, counter,
+            [("GET", f"/patients/{i}/heartbeats?limit=5000&fields=id,timestamp,predicted_type", None)
+             for i in patient_ids]
+        ),
+        "patient_stats": timed_requests(client, counter, [("GET", "/patients/stats", None)] * repeats),
+    }
+
+
+def bench_classify(client, counter, model_name, repeats, token, rng):
+    X, _ = generate_beats(repeats, rng)
+    headers = {"Authorization": f"Bearer {token}"}
+    # The first call traces the serving function; keep it out of the percentiles
+    client.post("/model/classify", json={"model_name": model_name, "beats": X[0].tolist()}, headers=headers)
+    requests = [("POST", "/model/classify", {"model_name": model_name, "beats": beat.tolist()}) for beat in X]
+    return timed_requests(client, counter, requests, headers=headers)
+
+
+def bench_retrain(app, counter, epochs):
+    from app.ml import retrain
+
+    retrain.EPOCHS = epochs
+    result = {"epochs": epochs, "input": retrain.TRAINING_INPUT}
+    with measured(counter, result):
+        retrain.run_retraining(app, user_id=1)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated heartbeat counts")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-folder", default=os.path.join(os.path.dirname(os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__)))), "model"))
+    parser.add_argument("--beats-per-patient", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=50, help="requests per read/classify endpoint")
+    parser.add_argument("--retrain-max-rows", type=int, default=1000,
+                        help="only retrain at scales up to this many beats (0 disables)")
+    parser.add_argument("--retrain-epochs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON here as well as to stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="arrhythmia_bench_")
+    # Retraining writes new model files; keep them out of the real model folder
+    model_folder = os.path.join(workdir, "model")
+    os.makedirs(model_folder)
+    shutil.copy(os.path.join(args.model_folder, f"{args.model}.h5"), model_folder)
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-with-enough-bytes")
+    os.environ["MODEL_WARMUP"] = "0"
+
+    from app import create_app
+    from app.extensions import db
+    from app.ml import registry
+    from app.utils.jwt import generate_token
+
+    registry.MODEL_FOLDER = model_folder
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        token = generate_token(SimpleNamespace(id=1, role="doctor"))
+        dialect = db.engine.dialect.name
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "dialect": dialect,
+            "model": args.model,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "scales": {}
+    }
+
+    for rows in [int(s) for s in args.scales.split(",")]:
+        print(f"Benchmarking {rows} heartbeats...", file=sys.stderr)
+        rng = np.random.default_rng(args.seed)
+        patients = max(1, rows // args.beats_per_patient)
+        with app.app_context():
+            reset_schema(db)
+
+        results = {"patients": patients}
+        results["predict"] = bench_predict(app, counter, workdir, args.model, rows, patients, rng)
+        results["save_heartbeat_predictions"] = bench_save(app, counter, args.model, rows, patients, rng)
+        results.update(bench_reads(client, counter, patients, args.repeats))
+        results["classify"] = bench_classify(client, counter, args.model, args.repeats, token, rng)
+        if rows <= args.retrain_max_rows:
+            results["retrain"] = bench_retrain(app, counter, args.retrain_epochs)
+        report["scales"][str(rows)] = results
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
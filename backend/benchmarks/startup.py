@@ -0,0 +1,127 @@
+"""Measure worker cold start: create_app() time and resident memory before and after the first requests.
+
+Each repeat runs in a fresh interpreter. The first non-ML requests (/health,
+/patients) should not load TensorFlow, pandas, scikit-learn or SciPy; the
+first /model/classify call shows what the ML stack costs once it is needed:
+
+    python -m benchmarks.startup --repeats 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL = "best_model_cnn_lstm"
+ML_MODULES = ("tensorflow", "keras", "pandas", "sklearn", "scipy", "onnxruntime", "ai_edge_litert")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+
+
+def measure(model_name, model_folder):
+    """Runs in the child: nothing from the app may be imported before the clock starts."""
+    started = time.perf_counter()
+    from app import create_app
+    app = create_app()
+    result = {"create_app_seconds": round(time.perf_counter() - started, 3), "create_app_rss_mb": rss_mb()}
+
+    client = app.test_client()
+    started = time.perf_counter()
+    for url in ("/health", "/patients?limit=10"):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    result["first_requests_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["idle_rss_mb"] = rss_mb()
+    result["idle_ml_modules"] = [m for m in ML_MODULES if m in sys.modules]
+
+    if model_name:
+        from types import SimpleNamespace
+        from app.ml import registry
+        from app.utils.jwt import generate_token
+
+        registry.MODEL_FOLDER = model_folder
+        with app.app_context():
+            token = generate_token(SimpleNamespace(id=1, role="doctor"))
+        started = time.perf_counter()
+        response = client.post("/model/classify", json={"model_name": model_name, "beats": [0.0] * 187},
+                               headers={"Authorization": f"Bearer {token}"})
+        if response.status_code >= 400:
+            raise RuntimeError(f"/model/classify returned {response.status_code}: {response.get_data(as_text=True)}")
+        result["first_classify_seconds"] = round(time.perf_counter() - started, 3)
+        result["classify_rss_mb"] = rss_mb()
+        result["classify_ml_modules"] = [m for m in ML_MODULES if m in sys.modules]
+    return result
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model for the first classify call ('' skips it)")
+    parser.add_argument("--model-folder", default=os.path.join(os.path.dirname(BACKEND_DIR), "model"))
+    parser.add_argument("--output", help="write JSON here as well as to stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.model, args.model_folder)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="arrhythmia_startup_")
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark-secret-key-with-enough-bytes")
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env["MODEL_WARMUP"] = "0"
+    env["PYTHONPATH"] = BACKEND_DIR
+    env.pop("INFERENCE_SOCKET", None)
+
+    subprocess.run([sys.executable, "-m", "flask", "--app", "wsgi", "db", "upgrade"], cwd=BACKEND_DIR, env=env,
+                   check=True, capture_output=True)
+
+    runs = []
+    for i in range(args.repeats):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", "--model", args.model,
+             "--model-folder", args.model_folder],
+            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        run["process_seconds"] = round(time.perf_counter() - started, 3)
+        runs.append(run)
+        print(f"Run {i + 1}/{args.repeats}: {run}", file=sys.stderr)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    numeric = [key for key, value in runs[0].items() if isinstance(value, (int, float))]
+    report = {
+        "meta": {"repeats": args.repeats, "engine": os.getenv("INFERENCE_ENGINE", "keras"),
+                 "python": sys.version.split()[0]},
+        "median": {key: median([run[key] for run in runs]) for key in numeric},
+        "idle_ml_modules": runs[-1]["idle_ml_modules"],
+        "classify_ml_modules": runs[-1].get("classify_ml_modules"),
+        "runs": runs,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Production gunicorn settings, picked up automatically from the working directory:
+
+    gunicorn wsgi:app
+
+Every value can be overridden through the environment (GUNICORN_*, TF_*).
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# Predictions run in background jobs, but uploads and exports can still take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = "-"
+errorlog = "-"
+
+reload = os.getenv("GUNICORN_RELOAD", "0") == "1"
+# Reloading re-imports the app in each worker, which defeats preloading
+preload_app = not reload and os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Split the cores between workers; TensorFlow otherwise starts one pool thread per core in each
+_cores = multiprocessing.cpu_count()
+os.environ.setdefault("TF_INTRA_OP_THREADS", str(max(1, _cores // workers)))
+os.environ.setdefault("TF_INTER_OP_THREADS", "1")
+
+# TensorFlow is not fork-safe once it has run an op, so the app itself never
+# warms up here and every worker loads its models once it has started.
+# MODEL_WARMUP=0 turns that off (e.g. when an inference service holds the models).
+_warm_up_models = os.getenv("MODEL_WARMUP", "1") == "1"
+os.environ["MODEL_WARMUP"] = "0"
+
+# Workers share /metrics through files in this directory. It has to be emptied
+# before the app is preloaded, since the metrics are created at import time.
+_metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if _metrics_dir:
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir)
+
+
+def child_exit(server, worker):
+    if _metrics_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    from app.extensions import db
+
+    # Connections opened by the master must not be shared with the children
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Runs after the worker has loaded the app, with or without preloading
+    if _warm_up_models:
+        from app.ml import registry
+        registry.warm_up()
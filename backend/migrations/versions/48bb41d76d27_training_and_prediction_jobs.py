@@ -0,0 +1,111 @@
+"""training and prediction jobs, patient summaries, trained model provenance
+
+Tables and columns that are already there (created by db.create_all() on an
+intermediate release, or by app.utils.migrate_trained_models) are skipped.
+
+Revision ID: 48bb41d76d27
+Revises: 716ba9ca2bc7
+Create Date: 2026-10-18 16:08:27.315590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '48bb41d76d27'
+down_revision = '716ba9ca2bc7'
+branch_labels = None
+depends_on = None
+
+BASE_MODEL_FOREIGN_KEY = 'fk_trained_model_base_model_id'
+
+
+def trained_model_columns():
+    return [
+        sa.Column('training_mode', sa.String(length=20), nullable=False, server_default='full'),
+        sa.Column('base_model_id', sa.Integer(), nullable=True),
+        sa.Column('data_from_id', sa.Integer(), nullable=True),
+        sa.Column('data_to_id', sa.Integer(), nullable=True),
+        sa.Column('replay_fraction', sa.Float(), nullable=True),
+        sa.Column('sample_count', sa.Integer(), nullable=True),
+    ]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    existing = {c['name'] for c in inspector.get_columns('trained_model')}
+    missing = [column for column in trained_model_columns() if column.name not in existing]
+    if missing:
+        with op.batch_alter_table('trained_model', schema=None) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+            if 'base_model_id' not in existing:
+                batch_op.create_foreign_key(BASE_MODEL_FOREIGN_KEY, 'trained_model', ['base_model_id'], ['id'])
+
+    if 'training_job' not in tables:
+        op.create_table('training_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('pid', sa.Integer(), nullable=True),
+        sa.Column('mode', sa.String(length=20), nullable=False),
+        sa.Column('replay_fraction', sa.Float(), nullable=False),
+        sa.Column('epoch', sa.Integer(), nullable=False),
+        sa.Column('total_epochs', sa.Integer(), nullable=True),
+        sa.Column('batch', sa.Integer(), nullable=False),
+        sa.Column('total_batches', sa.Integer(), nullable=True),
+        sa.Column('loss', sa.Float(), nullable=True),
+        sa.Column('accuracy', sa.Float(), nullable=True),
+        sa.Column('val_loss', sa.Float(), nullable=True),
+        sa.Column('val_accuracy', sa.Float(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('model_version', sa.String(length=10), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'patient_summary' not in tables:
+        op.create_table('patient_summary',
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('total_heartbeats', sa.Integer(), nullable=False),
+        sa.Column('class_counts', sa.JSON(), nullable=False),
+        sa.Column('confidence_sum', sa.Float(), nullable=False),
+        sa.Column('confidence_count', sa.Integer(), nullable=False),
+        sa.Column('last_prediction_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['patient_id'], ['patient.id'], ),
+        sa.PrimaryKeyConstraint('patient_id')
+        )
+    if 'prediction_job' not in tables:
+        op.create_table('prediction_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('model_name', sa.String(length=100), nullable=False),
+        sa.Column('file_path', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('rows_processed', sa.Integer(), nullable=False),
+        sa.Column('rows_per_second', sa.Float(), nullable=True),
+        sa.Column('model_performance_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['model_performance_id'], ['model_performance.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('prediction_job')
+    op.drop_table('patient_summary')
+    op.drop_table('training_job')
+    with op.batch_alter_table('trained_model', schema=None) as batch_op:
+        batch_op.drop_constraint(BASE_MODEL_FOREIGN_KEY, type_='foreignkey')
+        for column in reversed(trained_model_columns()):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,31 @@
+"""backfill patient summaries
+
+Builds the patient_summary rollup from the heartbeats already stored; new
+heartbeats keep it current from here on.
+
+Revision ID: 528da59bf40f
+Revises: 48bb41d76d27
+Create Date: 2026-10-18 16:09:51.077431
+
+"""
+from alembic import op
+from sqlalchemy.orm import Session
+
+from app.utils.summaries import rebuild_patient_summaries
+
+
+# revision identifiers, used by Alembic.
+revision = '528da59bf40f'
+down_revision = '48bb41d76d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Alembic's connection, so the rows land in the migration's own transaction
+    rebuild_patient_summaries(Session(bind=op.get_bind()))
+
+
+def downgrade():
+    # The table goes away with the previous revision
+    pass
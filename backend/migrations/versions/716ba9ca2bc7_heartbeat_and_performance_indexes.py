@@ -0,0 +1,51 @@
+"""heartbeat and model performance indexes
+
+Indexes that already exist with the same columns (e.g. built by
+app.utils.create_indexes) are kept; any with other columns are rebuilt.
+
+Revision ID: 716ba9ca2bc7
+Revises: fb7e148a30b8
+Create Date: 2026-10-18 16:06:40.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '716ba9ca2bc7'
+down_revision = 'fb7e148a30b8'
+branch_labels = None
+depends_on = None
+
+LABELED = sa.text('heartbeat_type IS NOT NULL')
+
+# (table, name, columns, dialect options)
+INDEXES = [
+    ('heartbeat', 'ix_heartbeat_labeled', ['heartbeat_type', 'id'],
+     {'sqlite_where': LABELED, 'postgresql_where': LABELED}),
+    ('heartbeat', 'ix_heartbeat_patient_id_id', ['patient_id', 'id'], {}),
+    ('heartbeat', 'ix_heartbeat_patient_id_timestamp', ['patient_id', 'timestamp'], {}),
+    ('heartbeat', 'ix_heartbeat_predicted_type', ['predicted_type'], {}),
+    ('model_performance', 'ix_model_performance_model_name_timestamp', ['model_name', 'timestamp'], {}),
+    ('model_performance', 'ix_model_performance_timestamp', ['timestamp'], {}),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {
+        table: {ix['name']: ix['column_names'] for ix in inspector.get_indexes(table)}
+        for table in {table for table, _, _, _ in INDEXES}
+    }
+    for table, name, columns, options in INDEXES:
+        if existing[table].get(name) == columns:
+            continue
+        if name in existing[table]:
+            op.drop_index(name, table_name=table)
+        op.create_index(name, table, columns, unique=False, **options)
+
+
+def downgrade():
+    for table, name, _, options in reversed(INDEXES):
+        op.drop_index(name, table_name=table, **options)
@@ -0,0 +1,66 @@
+"""store heartbeat ecg_features as packed float32
+
+Converts the JSON vectors in id-ordered batches (see
+app.utils.migrate_ecg_features); a database already converted by that
+script is left as it is.
+
+Revision ID: fb7e148a30b8
+Revises: 9831bfcde12e
+Create Date: 2026-10-18 16:05:12.418307
+
+"""
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+from app.models.types import FLOAT32
+from app.utils.migrate_ecg_features import COLUMN, TABLE, TMP_COLUMN, _columns, convert_batch, is_converted
+
+
+# revision identifiers, used by Alembic.
+revision = 'fb7e148a30b8'
+down_revision = '9831bfcde12e'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = _columns(bind)
+    if is_converted(columns):
+        return
+
+    if TMP_COLUMN not in columns:
+        op.add_column(TABLE, sa.Column(TMP_COLUMN, sa.LargeBinary(), nullable=True))
+
+    last_id = 0
+    while True:
+        count, last_id = convert_batch(bind, last_id, BATCH_SIZE)
+        if not count:
+            break
+
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        batch_op.drop_column(COLUMN)
+        batch_op.alter_column(TMP_COLUMN, new_column_name=COLUMN,
+                              existing_type=sa.LargeBinary(), existing_nullable=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    op.add_column(TABLE, sa.Column(TMP_COLUMN, sa.JSON(), nullable=True))
+
+    rows = bind.execute(sa.text(f"SELECT id, {COLUMN} FROM {TABLE} WHERE {COLUMN} IS NOT NULL")).all()
+    update = sa.text(f"UPDATE {TABLE} SET {TMP_COLUMN} = :values WHERE id = :id")
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [
+            {"id": row_id, "values": json.dumps(np.frombuffer(blob, dtype=FLOAT32).tolist())}
+            for row_id, blob in rows[start:start + BATCH_SIZE]
+        ])
+
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        batch_op.drop_column(COLUMN)
+        batch_op.alter_column(TMP_COLUMN, new_column_name=COLUMN, existing_type=sa.JSON(), existing_nullable=True)
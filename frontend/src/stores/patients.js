@@ -13,8 +13,16 @@ export const usePatientStore = defineStore("PatientStore", {
   actions: {
     async fetchAllPatients() {
       try {
-        const res = await axios.get("/patients");
-        this.all = res.data;
+        const patients = [];
+        let cursor = null;
+        do {
+          const res = await axios.get("/patients", {
+            params: { limit: 500, cursor },
+          });
+          patients.push(...res.data.patients);
+          cursor = res.data.next_cursor;
+        } while (cursor);
+        this.all = patients;
       } catch (err) {
         this.error = err;
         console.error("Failed to fetch all patients:", err);
@@ -44,8 +52,20 @@ export const usePatientStore = defineStore("PatientStore", {
 
     async fetchPatientHeartbeats(patientId) {
       try {
-        const res = await axios.get(`/patients/${patientId}/heartbeats`);
-        this.heartbeats = res.data;
+        const heartbeats = [];
+        let afterId = 0;
+        do {
+          const res = await axios.get(`/patients/${patientId}/heartbeats`, {
+            params: {
+              after_id: afterId,
+              limit: 5000,
+              fields: "id,timestamp,heartbeat_type,predicted_type,prediction_confidence",
+            },
+          });
+          heartbeats.push(...res.data.heartbeats);
+          afterId = res.data.next_after_id;
+        } while (afterId);
+        this.heartbeats = heartbeats;
       } catch (err) {
         this.error = err;
         console.error("Failed to fetch heartbeats:", err);
@@ -62,10 +82,11 @@ export const usePatientStore = defineStore("PatientStore", {
       }
     },
 
-    async fetchHeartbeatById(patientId, heartbeatId) {
+    async fetchHeartbeatById(patientId, heartbeatId, points = null) {
       try {
         const res = await axios.get(
-          `/patients/${patientId}/heartbeats/${heartbeatId}`
+          `/patients/${patientId}/heartbeats/${heartbeatId}`,
+          { params: points ? { points } : {} }
         );
         return res.data;
       } catch (err) {